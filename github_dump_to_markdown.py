@@ -64,46 +64,154 @@ Examples:
        --url https://github.com/owner/repo/commits/main
 
 
-$ github_dump_to_markdown.py [-h] [-t TOKEN] [--owner OWNER] [--repo REPO] [--url URL] [-n NUMBERS [NUMBERS ...]]
-                             [--api API] [-o OUTPUT_DIR] [-dt DUMPTYPE] [--branch BRANCH] [--sha SHA]
+$ github_dump_to_markdown.py [-h] [-t TOKEN [TOKEN ...]] [--token-file TOKEN_FILE] [--owner OWNER] [--repo REPO] [--url URL] [-n NUMBERS [NUMBERS ...]]
+                             [--org ORG] [--repo-list REPO_LIST] [--api API] [-o OUTPUT_DIR] [-dt DUMPTYPE] [--branch BRANCH [BRANCH ...]] [--sha SHA]
+                             [-c CONCURRENCY] [-b BATCH_SIZE] [--list] [--page-size PAGE_SIZE]
+                             [--rate-limit-reserve RATE_LIMIT_RESERVE] [--max-retries MAX_RETRIES] [--retry-budget RETRY_BUDGET]
+                             [--full-refresh] [--resume] [--not-found-ttl NOT_FOUND_TTL] [--grace-period GRACE_PERIOD] [--max-connections MAX_CONNECTIONS]
+                             [--max-connections-per-host MAX_CONNECTIONS_PER_HOST] [--keepalive-timeout KEEPALIVE_TIMEOUT]
+                             [--dns-cache-ttl DNS_CACHE_TTL] [--connect-timeout CONNECT_TIMEOUT]
+                             [--read-timeout READ_TIMEOUT] [--stream-json] [--cache] [--no-cache] [--refresh] [--cache-dir CACHE_DIR]
+                             [--cache-ttl CACHE_TTL] [--cache-size CACHE_SIZE]
 
 Note:
 - If `--url` is provided, the program will automatically determine the `owner`, `repo`, `dumptype`, and either `numbers` (for discussions, issues, or pull requests) or `branch` (for commits) or `sha` (for commit) based on the provided URL
-- If numbers are provided both via `--url` and `--numbers`, the program will combine them.
+- If numbers are provided both via `--url` and `--numbers`, the program will combine them, each number is fetched once.
+- An open-ended range like `5000-` runs up to the latest discussion or pullRequest or issue of the repository.
+- Discussions or pullRequests or issues dumped by `--numbers` are recorded in `.manifest.sqlite` inside the output directory, later runs first check
+  their `updatedAt` with one cheap query per 100 numbers and only fetch again the ones updated since.
+- An updated pullRequest or issue only has its comments after the last one dumped fetched, and they are appended to its markdown file.
+  It is fetched again in full when its title, body or state changed or comments were deleted, edits of older comments are not detected.
+- Numbers that don't exist as the requested dumptype (deleted, transferred, or a pullRequest when dumping issues) are recorded in the manifest
+  and skipped for `--not-found-ttl` seconds. Only numbers below an existing one are recorded, numbers past the latest item are probed every run.
+- A markdown file whose rendered content is identical to the existing file is not rewritten and keeps its mtime.
+- An output directory is locked through its `.lock` file while a run dumps into it, an overlapping run skips that repository.
+- Progress is journaled in `.checkpoint.jsonl` inside the output directory while a run is going on, a run interrupted by a crash
+  or a network drop is continued with `--resume` given with the same options. The journal is removed once the run completes.
+- On SIGINT or SIGTERM no new item is started, the items in progress get `--grace-period` seconds to finish, the pending markdown files
+  are written and the progress is saved, so the run can be continued with `--resume`. A second signal stops at once.
+- Commits are remembered in `.commits.json.gz` inside the output directory, later `commits` runs only fetch the commits added since and rewrite `commits_{branch}.md`.
+  The store is shared by all the branches, the history a branch has in common with another one is only fetched once.
+- A long history fetched for the first time is split into `--concurrency` x 4 windows of commit dates spread evenly between the oldest commit
+  and the head, fetched in parallel. Commits bunched in a short span of dates, e.g. a history imported in one go, land in a few windows
+  which are paginated one page after the other.
+- Requests reuse pooled keep-alive connections, `--max-connections` should stay above `--concurrency`. The faster `uvloop` event loop is used when it is installed (pip install uvloop).
+- Responses are requested gzip compressed and decoded with `orjson` when it is installed (pip install orjson), brotli compression is requested too when `brotli` is installed.
+- The response cache is off unless `--cache` or `--refresh` is given, responses are only reused with the same tokens. Responses decoded with `--stream-json` are not cached.
+- With `--org` or `--repo-list` every repository is dumped into its own `{output-dir}/{repo}` directory, `{output-dir}/{owner}/{repo}` when
+  the repositories belong to more than one owner. The repositories share the
+  tokens and `--concurrency` requests in flight, which are handed out to the repositories in turn so a large repository does not hold up the others.
 
 Options:
   -h, --help       show this help message and exit
   -t, --token      GitHub Access Token: If this parameter is not provided, the program will attempt to obtain a
                    GitHub authentication token using the `gh auth login` command from the GitHub CLI (requires the `gh` CLI to be installed).
+                   Several space-separated tokens share the requests, each one is used while it has the most rate limit budget left
+  --token-file     File with one GitHub Access Token per line, combined with `--token`
   --url            GitHub Repository URL. Automatically extracts `owner`, `repo`, `dumptype`, and either 
                    `numbers` (for discussions, issues, or pull requests) or 
                    `branch` (for commits) or `sha` (for commit) based on the provided URL
   --owner          GitHub Repository Owner, required unless `--url` is provided
   --repo           GitHub Repository Name, required unless `--url` is provided
+  --org            GitHub Organization, every repository of the organization is dumped in the same run
+  --repo-list      File with one repository per line as `owner/repo`, a repository URL or a name of `--org` or `--owner`, all dumped in the same run
   -dt, --dumptype  Enter discussion or pullRequest or issue or commits or commit, default discussion
-  -n, --numbers    GitHub Discussion or PullRequest or Issue Numbers (space-separated, supports ranges like '1000-1200')
-  --branch         Git branch is required when `dumptype` is set to `commits` or provided through `--url`
+  -n, --numbers    GitHub Discussion or PullRequest or Issue Numbers (space-separated, supports ranges like '1000-1200' and open-ended ranges like '5000-')
+  --branch         Git branch is required when `dumptype` is set to `commits` or provided through `--url`.
+                   Several space-separated branches are fetched in parallel and share the commits of their common history
   --sha            Git commit sha is required when `dumptype` is set to `commit` or provided through `--url`
   -o, --output-dir Output directory for markdown files, default docs
   --api            GitHub GraphQL endpoint, default https://api.github.com/graphql
+  -c, --concurrency Number of discussions or pullRequests or issues, or of commit history windows, fetched in parallel, default 4
+  -b, --batch-size Number of discussions or pullRequests or issues requested per GraphQL query, default 10, at most 100 (40 for discussions)
+  --list           List the existing discussions or pullRequests or issues of the repository page by page instead of probing every number,
+                   all of them unless `--numbers` restricts the range.
+                   With `--numbers` only the item numbers are listed, from the oldest item, and the requested items are fetched `--page-size` at a time
+  --page-size      Number of items per page in `--list` mode, default and at most 100 (40 for discussions)
+  --rate-limit-reserve GraphQL rate limit points kept in reserve, all requests pause until the rate limit resets once the budget drops below it, default 50
+  --max-retries    Number of times a failed request is retried with exponential backoff, default 5
+  --retry-budget   Total number of retries allowed for the whole run, default 200
+  --full-refresh   Fetch everything again instead of only the commits added and the discussions or pullRequests or issues updated since the last run
+  --resume         Continue an interrupted run from its checkpoint journal, skipping the items already written and continuing the commit histories from their last page
+  --not-found-ttl  Seconds a number found not to exist is skipped by later runs, 0 to probe every number again, default 604800 (a week)
+  --grace-period   Seconds the items in progress are given to finish on SIGINT or SIGTERM before their requests are cancelled, default 20
+  --max-connections Maximum number of pooled HTTP connections, 0 for no limit, default 100
+  --max-connections-per-host Maximum number of pooled HTTP connections to the GraphQL host, 0 for no limit other than `--max-connections`, default 0
+  --keepalive-timeout Seconds an idle connection is kept open for reuse, default 60
+  --dns-cache-ttl  Seconds resolved host addresses are cached, default 300
+  --connect-timeout Seconds allowed to open a connection before the request is retried, default 10
+  --read-timeout   Seconds allowed between two reads of a response before the request is retried, default 60
+  --stream-json    Decode responses incrementally while they are received, keeping memory low for very large pages at the cost of more CPU time (requires ijson)
+  --cache          Reuse the GraphQL responses cached on disk by earlier runs and cache the new ones
+  --no-cache       Do not use the response cache, default
+  --refresh        Bypass and replace the cached responses, implies `--cache`. Items unchanged since the last run are still skipped, use `--full-refresh` to fetch everything again
+  --cache-dir      Directory of the response cache, default ~/.cache/github_dump_to_markdown
+  --cache-ttl      Seconds a cached response is reused, default 3600 for discussions or pullRequests or issues, 600 for commits, no expiry for a single commit
+  --cache-size     Maximum size of the response cache in MB, the least recently used responses are deleted beyond it, default 512
 
 Credits & Reference
 https://github.com/intel/dffml/blob/main/scripts/dump_discussion.py
 https://github.com/intel/dffml/blob/main/scripts/discussion_dump_to_markdown.py
 https://github.com/orgs/community/discussions/3315#discussioncomment-3094387
 """
+import os
 import sys
 import re
+import json
+import gzip
+import zlib
+import hashlib
+import sqlite3
+import time
+import random
+import bisect
 import asyncio
+import itertools
+import contextlib
+import contextvars
+import collections
+import weakref
+import threading
 import aiohttp
 import pathlib
 import argparse
 import traceback
 import subprocess
+import signal
 from dataclasses import dataclass, field
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from datetime import datetime
 from urllib.parse import urlparse
+from email.utils import parsedate_to_datetime
+
+try:
+  import uvloop # optional, faster event loop
+except ImportError:
+  uvloop = None
+
+try:
+  import orjson # optional, faster JSON decoding straight from bytes
+  json_loads = orjson.loads
+except ImportError:
+  json_loads = json.loads
+
+try:
+  import ijson # optional, incremental decoding for --stream-json
+except ImportError:
+  ijson = None
+
+try:
+  import brotli # optional, aiohttp decodes br responses only when it is installed
+  ACCEPT_ENCODING = "gzip, br"
+except ImportError:
+  ACCEPT_ENCODING = "gzip"
+
+try:
+  import fcntl # locks of the output directories
+except ImportError:
+  fcntl = None
+  import msvcrt # Windows
 
 @dataclass
 class Reply:
@@ -131,6 +239,10 @@ class QueryResult:
   author: str
   created_at: datetime
   comments: List[Comment] = field(default_factory=list)
+  id: str = ""
+  updated_at: str = ""
+  comments_cursor: str = None # endCursor of the last comment page
+  comments_offset: Optional[int] = None # comments already in the markdown file when only the ones after them are in comments
 
 @dataclass
 class CommitQueryResult:
@@ -139,176 +251,1976 @@ class CommitQueryResult:
   message: str
   committedDate: datetime
   author: str
+  parents: List[str] = field(default_factory=list)
+
+class IntervalSet:
+  """
+  Set of item numbers stored as sorted, merged and inclusive (start, end) intervals
+
+  Overlapping or adjacent ranges are merged when added, so every number is contained once.
+  An end of None is open-ended (e.g. '5000-'), iteration yields numbers lazily in ascending order.
+  """
+  def __init__(self, intervals=()):
+    self.intervals = []
+    for start, end in intervals:
+      self.add(start, end)
+
+  def add(self, start: int, end: int = None):
+    merged_start, merged_end = start, end
+    kept = []
+    for interval_start, interval_end in self.intervals:
+      if (merged_end is not None and interval_start > merged_end + 1) or (interval_end is not None and interval_end < merged_start - 1):
+        kept.append((interval_start, interval_end))
+        continue
+      merged_start = min(merged_start, interval_start)
+      merged_end = None if merged_end is None or interval_end is None else max(merged_end, interval_end)
+    kept.append((merged_start, merged_end))
+    kept.sort()
+    self.intervals = kept
+
+  @property
+  def is_open(self) -> bool:
+    return bool(self.intervals) and self.intervals[-1][1] is None
+
+  @property
+  def last(self):
+    """
+    Largest number of the set, None if the set is empty or open-ended
+    """
+    return self.intervals[-1][1] if self.intervals else None
+
+  def bounded(self, last: int) -> "IntervalSet":
+    """
+    Return a copy whose numbers are all at most last
+    """
+    return IntervalSet((start, last if end is None else min(end, last)) for start, end in self.intervals if start <= last)
+
+  def __contains__(self, number: int) -> bool:
+    # Last interval starting at or before number, a 1-tuple sorts before every interval with the same start
+    index = bisect.bisect_left(self.intervals, (number + 1,)) - 1
+    if index < 0:
+      return False
+    start, end = self.intervals[index]
+    return end is None or number <= end
+
+  def __iter__(self):
+    for start, end in self.intervals:
+      yield from itertools.count(start) if end is None else range(start, end + 1)
+
+  def __bool__(self) -> bool:
+    return bool(self.intervals)
+
+  def __str__(self) -> str:
+    return ", ".join(str(start) if start == end else f"{start}-{'' if end is None else end}" for start, end in self.intervals)
+
+issueCommentsFields = """
+fragment issueCommentsFields on IssueCommentConnection {
+  totalCount
+  pageInfo {
+    hasNextPage
+    endCursor
+  }
+  nodes {
+    id
+    body
+    author {
+      login
+    }
+    createdAt
+  }
+}
+"""
+
+discussionRepliesFields = """
+fragment discussionRepliesFields on DiscussionCommentConnection {
+  totalCount
+  pageInfo {
+    hasNextPage
+    endCursor
+  }
+  nodes {
+    id
+    body
+    author {
+      login
+    }
+    createdAt
+  }
+}
+"""
+
+discussionCommentsFields = """
+fragment discussionCommentsFields on DiscussionCommentConnection {
+  totalCount
+  pageInfo {
+    hasNextPage
+    endCursor
+  }
+  nodes {
+    id
+    body
+    author {
+      login
+    }
+    createdAt
+    replies(first: 100) {
+      ...discussionRepliesFields
+    }
+  }
+}
+""" + discussionRepliesFields
+
+pullRequestFields = """
+fragment pullRequestFields on PullRequest {
+  id
+  title
+  body
+  author {
+    login
+  }
+  createdAt
+  updatedAt
+  state
+  url
+  comments(first: 100, after: $commentsCursor) {
+    ...issueCommentsFields
+  }
+}
+""" + issueCommentsFields
+
+issueFields = """
+fragment issueFields on Issue {
+  id
+  title
+  body
+  author {
+    login
+  }
+  createdAt
+  updatedAt
+  state
+  url
+  comments(first: 100, after: $commentsCursor) {
+    ...issueCommentsFields
+  }
+}
+""" + issueCommentsFields
+
+discussionFields = """
+fragment discussionFields on Discussion {
+  id
+  title
+  body
+  author {
+    login
+  }
+  createdAt
+  updatedAt
+  url
+  comments(first: 100, after: $commentsCursor) {
+    ...discussionCommentsFields
+  }
+}
+""" + discussionCommentsFields
+
+rateLimitFields = """  rateLimit {
+    cost
+    remaining
+    resetAt
+  }
+"""
 
 querypullRequests = """
 query($owner: String!, $repo: String!, $number: Int!, $commentsCursor: String) {
-  repository(owner: $owner, name: $repo) {
+""" + rateLimitFields + """  repository(owner: $owner, name: $repo) {
     pullRequest(number: $number) {
-      title
-      body
-      author {
-        login
-      }
-      createdAt
-      state
-      url
-      comments(first: 100, after: $commentsCursor) {
-        totalCount
-        pageInfo {
-          hasNextPage
-          endCursor
-        }
-        nodes {
-          id
-          body
-          author {
-            login
-          }
-          createdAt
-        }
-      }
+      ...pullRequestFields
     }
   }
 }
-"""
+""" + pullRequestFields
 
 queryIssues = """
 query($owner: String!, $repo: String!, $number: Int!, $commentsCursor: String) {
-  repository(owner: $owner, name: $repo) {
+""" + rateLimitFields + """  repository(owner: $owner, name: $repo) {
     issue(number: $number) {
-      title
-      body
-      author {
-        login
-      }
-      createdAt
-      state
-      url
-      comments(first: 100, after: $commentsCursor) {
-        totalCount
-        pageInfo {
-          hasNextPage
-          endCursor
-        }
-        nodes {
-          id
-          body
-          author {
-            login
-          }
-          createdAt
-        }
-      }
+      ...issueFields
     }
   }
 }
-"""
+""" + issueFields
 
 queryDiscussion = """
-query($owner: String!, $repo: String!, $number: Int!, $commentsCursor: String, $repliesCursor: String) {
-  repository(owner: $owner, name: $repo) {
+query($owner: String!, $repo: String!, $number: Int!, $commentsCursor: String) {
+""" + rateLimitFields + """  repository(owner: $owner, name: $repo) {
     discussion(number: $number) {
-      title
-      body
-      author {
-        login
+      ...discussionFields
+    }
+  }
+}
+""" + discussionFields
+
+# Continuation pages only select the comments connection of the node, not the whole item again
+queryPullRequestComments = """
+query($id: ID!, $commentsCursor: String) {
+""" + rateLimitFields + """  node(id: $id) {
+    ... on PullRequest {
+      comments(first: 100, after: $commentsCursor) {
+        ...issueCommentsFields
       }
-      createdAt
-      url
+    }
+  }
+}
+""" + issueCommentsFields
+
+queryIssueComments = """
+query($id: ID!, $commentsCursor: String) {
+""" + rateLimitFields + """  node(id: $id) {
+    ... on Issue {
       comments(first: 100, after: $commentsCursor) {
-        totalCount
-        pageInfo {
-          hasNextPage
-          endCursor
-        }
-        nodes {
-          id
-          body
-          author {
-            login
-          }
-          createdAt
-          replies(first: 100, after: $repliesCursor) {
-            totalCount
+        ...issueCommentsFields
+      }
+    }
+  }
+}
+""" + issueCommentsFields
+
+queryDiscussionComments = """
+query($id: ID!, $commentsCursor: String) {
+""" + rateLimitFields + """  node(id: $id) {
+    ... on Discussion {
+      comments(first: 100, after: $commentsCursor) {
+        ...discussionCommentsFields
+      }
+    }
+  }
+}
+""" + discussionCommentsFields
+
+itemQueries = {
+  "discussion": {"query": queryDiscussion, "fields": discussionFields, "comments": queryDiscussionComments, "type": "Discussion"},
+  "pullRequest": {"query": querypullRequests, "fields": pullRequestFields, "comments": queryPullRequestComments, "type": "PullRequest"},
+  "issue": {"query": queryIssues, "fields": issueFields, "comments": queryIssueComments, "type": "Issue"},
+}
+
+queryCommits = """
+query($owner: String!, $repo: String!, $branch: String!, $historyCursor: String, $since: GitTimestamp, $until: GitTimestamp) {
+""" + rateLimitFields + """  repository(owner: $owner, name: $repo) {
+    ref(qualifiedName: $branch) {
+      target {
+        ... on Commit {
+          history(first: 100, after: $historyCursor, since: $since, until: $until) {
             pageInfo {
               hasNextPage
               endCursor
             }
-            nodes {
-              id
-              body
-              author {
-                login
+            edges {
+              node {
+                message
+                oid
+                committedDate
+                author {
+                  name
+                }
+                parents(first: 10) {
+                  nodes {
+                    oid
+                  }
+                }
               }
-              createdAt
             }
           }
         }
       }
-    }
-  }
-}
-"""
+    }
+  }
+}
+"""
+
+queryCommitsProbe = """
+query($owner: String!, $repo: String!, $branch: String!) {
+""" + rateLimitFields + """  repository(owner: $owner, name: $repo) {
+    createdAt
+    ref(qualifiedName: $branch) {
+      target {
+        ... on Commit {
+          oid
+          committedDate
+          history(first: 1) {
+            totalCount
+          }
+        }
+      }
+    }
+  }
+}
+"""
+
+queryCommitBySHA = """
+query($owner: String!, $repo: String!, $sha: GitObjectID!) {
+""" + rateLimitFields + """  repository(owner: $owner, name: $repo) {
+    object(oid: $sha) {
+      ... on Commit {
+        message
+        oid
+        committedDate
+        author {
+          name
+        }
+        url
+      }
+    }
+  }
+}
+"""
+
+queryOrganizationRepositories = """
+query($org: String!, $cursor: String) {
+""" + rateLimitFields + """  organization(login: $org) {
+    repositories(first: 100, after: $cursor, orderBy: {field: NAME, direction: ASC}) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      nodes {
+        name
+      }
+    }
+  }
+}
+"""
+
+class RateLimiter:
+  """
+  Budget of GitHub GraphQL points of a single token
+
+  The budget is refreshed from the `rateLimit` selection of each response (falling back to the `x-ratelimit-*` headers).
+  Each request reserves the last observed query cost before it is sent, and once the remaining points would drop below
+  `reserve` the token is parked until its budget resets instead of burning requests on rate limit errors.
+  """
+  def __init__(self, reserve: int = 50):
+    self.reserve = reserve
+    self.remaining = None # unknown until the first response arrives
+    self.reset_at = None # epoch seconds
+    self.cost = 1 # last observed query cost, used as the estimate for the next request
+    self.paused_until = 0.0 # epoch seconds, set when the server asks the token to back off
+
+  def ready_at(self) -> float:
+    """
+    Epoch seconds from which the token can be used again, 0 if it is usable now
+    """
+    now = time.time()
+    ready = self.paused_until if self.paused_until > now else 0.0
+    if self.remaining is not None and self.remaining - self.cost < self.reserve and self.reset_at:
+      if self.reset_at > now:
+        ready = max(ready, self.reset_at + 1)
+      else:
+        self.remaining = None # a new window has started, wait for the next response to know the budget
+    return ready
+
+  def budget(self) -> float:
+    """
+    Points left in the current window, a token without any response yet is assumed to be fresh
+    """
+    return float("inf") if self.remaining is None else self.remaining
+
+  def reserve_cost(self):
+    """
+    Reserve the estimated cost of one request
+    """
+    if self.remaining is not None:
+      self.remaining -= self.cost
+
+  def pause(self, seconds: float):
+    """
+    Hold back every request on this token for the given number of seconds
+    """
+    self.paused_until = max(self.paused_until, time.time() + seconds)
+
+  def update(self, result: dict, headers):
+    """
+    Refresh the budget from a GraphQL response body and its headers
+    """
+    remaining = reset_at = None
+    rate_limit = (result.get("data") or {}).get("rateLimit") if isinstance(result, dict) else None
+    if rate_limit:
+      self.cost = max(1, rate_limit["cost"])
+      remaining = rate_limit["remaining"]
+      reset_at = datetime.fromisoformat(rate_limit["resetAt"].replace('Z', '+00:00')).timestamp()
+    elif headers.get("x-ratelimit-remaining") and headers.get("x-ratelimit-reset"):
+      remaining = int(headers["x-ratelimit-remaining"])
+      reset_at = float(headers["x-ratelimit-reset"])
+
+    if isinstance(result, dict) and any(error.get("type") == "RATE_LIMITED" for error in result.get("errors") or []):
+      remaining = 0
+      reset_at = reset_at or self.reset_at or time.time() + 60
+
+    if remaining is None:
+      return
+    if self.remaining is None or self.reset_at is None or reset_at > self.reset_at:
+      # First response, or a new rate limit window has started
+      self.remaining = remaining
+    else:
+      # Responses of concurrent requests arrive out of order, keep the lowest count of the current window
+      self.remaining = min(self.remaining, remaining)
+    self.reset_at = reset_at
+
+class TokenPool:
+  """
+  Process-wide pool of GitHub tokens shared by every worker, each token with its own RateLimiter budget
+
+  Every request is assigned to the usable token with the most remaining points (ties go round-robin),
+  tokens that are nearly exhausted are parked until their reset, and when no token is usable all workers wait.
+  """
+  _shared = {}
+
+  def __init__(self, tokens: List[str], reserve: int = 50):
+    self.limiters = {token: RateLimiter(reserve) for token in dict.fromkeys(tokens)}
+    self._order = list(self.limiters)
+    self._lock = None
+
+  @property
+  def identity(self) -> str:
+    """
+    Hash of the tokens of the pool, tells which access a cached response was fetched with without storing the tokens
+    """
+    return hashlib.sha256("\n".join(sorted(self.limiters)).encode('utf-8')).hexdigest()
+
+  @classmethod
+  def of(cls, token):
+    """
+    Return token itself if it is already a pool, otherwise the process-wide pool of that single token
+    """
+    if isinstance(token, cls):
+      return token
+    if token not in cls._shared:
+      cls._shared[token] = cls([token])
+    return cls._shared[token]
+
+  async def acquire(self) -> str:
+    """
+    Pick the token for the next request and reserve its estimated cost
+    """
+    if self._lock is None:
+      self._lock = asyncio.Lock()
+    async with self._lock:
+      while True:
+        ready = [token for token in self._order if not self.limiters[token].ready_at()]
+        if ready:
+          token = max(ready, key=lambda token: self.limiters[token].budget())
+          self._order.remove(token)
+          self._order.append(token)
+          self.limiters[token].reserve_cost()
+          return token
+
+        wake_at = min(limiter.ready_at() for limiter in self.limiters.values())
+        if any(limiter.remaining is not None and limiter.remaining - limiter.cost < limiter.reserve for limiter in self.limiters.values()):
+          print(f"Rate limit nearly exhausted on all {len(self.limiters)} token(s), pausing until {datetime.fromtimestamp(wake_at).strftime('%Y-%m-%d %H:%M:%S')}")
+        await asyncio.sleep(max(0.0, wake_at - time.time()))
+
+  def update(self, token: str, result: dict, headers):
+    """
+    Refresh the budget of the token that sent the request
+    """
+    self.limiters[token].update(result, headers)
+
+  def pause(self, token: str, seconds: float):
+    """
+    Hold back one token, the other tokens keep serving requests
+    """
+    self.limiters[token].pause(seconds)
+
+class GraphQLRequestError(Exception):
+  """
+  Raised when a GraphQL request could not be completed, even after retrying
+  """
+
+class RetryPolicy:
+  """
+  Exponential backoff with jitter for transient request failures, limited by a retry budget shared by the whole run
+  """
+  def __init__(self, max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0, budget: int = 200):
+    self.max_retries = max_retries
+    self.base_delay = base_delay
+    self.max_delay = max_delay
+    self.budget = budget
+
+  def take(self) -> bool:
+    """
+    Consume one retry from the run budget, False once it is spent
+    """
+    if self.budget <= 0:
+      return False
+    self.budget -= 1
+    return True
+
+  def backoff(self, attempt: int, retry_after: float = None) -> float:
+    """
+    Delay before the given retry attempt, the server's Retry-After always wins over the computed backoff
+    """
+    if retry_after is not None:
+      return retry_after + random.uniform(0, 1)
+    return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+retry_policy = RetryPolicy()
+
+class FairScheduler:
+  """
+  Request slots shared by all the repositories dumped in one run, handed out round-robin between repositories
+
+  post_graphql holds a slot keyed by `current_repository` for each request. Once all the slots are taken, every
+  released slot goes to the next waiting repository in turn, so a giant repository with thousands of pending
+  requests cannot starve the others. Requests are not limited while `slots` is None.
+  """
+  def __init__(self, slots: int = None):
+    self.slots = slots
+    self.active = 0
+    self.waiters = {} # repository -> deque of futures, the dict order is the round-robin order
+
+  async def acquire(self, key):
+    if not self.waiters and (self.slots is None or self.active < self.slots):
+      self.active += 1
+      return
+    future = asyncio.get_running_loop().create_future()
+    self.waiters.setdefault(key, collections.deque()).append(future)
+    try:
+      await future
+    except asyncio.CancelledError:
+      if future.done() and not future.cancelled():
+        self.release() # the slot was handed over just before the cancellation
+      elif future in self.waiters.get(key, ()):
+        self.waiters[key].remove(future)
+        if not self.waiters[key]:
+          del self.waiters[key]
+      raise
+
+  def release(self):
+    self.active -= 1
+    while self.waiters and (self.slots is None or self.active < self.slots):
+      key = next(iter(self.waiters))
+      queue = self.waiters.pop(key)
+      future = queue.popleft()
+      if queue:
+        self.waiters[key] = queue # back to the end of the round
+      if not future.done():
+        self.active += 1
+        future.set_result(None)
+
+  @contextlib.asynccontextmanager
+  async def slot(self, key):
+    await self.acquire(key)
+    try:
+      yield
+    finally:
+      self.release()
+
+class SingleFlight:
+  """
+  Share a single call between concurrent callers asking for the same key
+
+  The first caller starts the call as a task, callers arriving while it is in flight await the same task and get
+  the same result or exception. A caller being cancelled does not cancel the call for the others. Nothing is kept
+  once the call is done, a later caller starts a new one.
+  """
+  def __init__(self):
+    self.calls = {}
+
+  async def do(self, key, call):
+    task = self.calls.get(key)
+    if task is None:
+      task = asyncio.ensure_future(call())
+      self.calls[key] = task
+      task.add_done_callback(lambda _: self.calls.pop(key, None))
+    return await asyncio.shield(task)
+
+  def cancel(self):
+    """
+    Cancel every call still in flight, once their callers were cancelled and nobody is left to await them
+    """
+    for task in list(self.calls.values()):
+      task.cancel()
+
+MAX_REQUESTS_IN_FLIGHT = 100 # GitHub's secondary rate limit allows no more than 100 concurrent requests
+
+current_repository = contextvars.ContextVar("current_repository", default=None)
+request_scheduler = FairScheduler()
+request_flights = SingleFlight()
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+def convert_streamed_node(prefix: str, node):
+  """
+  Replace comment and reply nodes by Comment and Reply objects as soon as they are decoded
+
+  A discussion comment whose replies continue on another page is kept as a node, parse_comments records where its
+  replies continue.
+  """
+  if not isinstance(node, dict):
+    return node
+  if prefix.endswith(".replies.nodes.item"):
+    return parse_replies([node])[0]
+  if prefix.endswith(".comments.nodes.item") and not ("replies" in node and node["replies"]["pageInfo"]["hasNextPage"]):
+    return parse_comment(node)
+  return node
+
+async def stream_json(stream) -> dict:
+  """
+  Decode a JSON document with ijson while it is read from an aiohttp stream
+
+  Objects and arrays are built bottom-up from the parser events, each one passing through convert_streamed_node
+  once it is complete, so the raw body is never held in memory and a page of comments only ever holds a single
+  comment node at a time.
+
+  Raises:
+    ValueError: The document is truncated or invalid
+  """
+  stack = [] # [container, current key, prefix] of the objects and arrays being built
+  document = None
+  try:
+    async for prefix, event, value in ijson.parse_async(stream, use_float=True):
+      if event == "map_key":
+        stack[-1][1] = value
+        continue
+      if event in ("start_map", "start_array"):
+        stack.append([{} if event == "start_map" else [], None, prefix])
+        continue
+      if event in ("end_map", "end_array"):
+        container, _, prefix = stack.pop()
+        value = convert_streamed_node(prefix, container)
+
+      if not stack:
+        document = value
+      elif isinstance(stack[-1][0], list):
+        stack[-1][0].append(value)
+      else:
+        stack[-1][0][stack[-1][1]] = value
+  except ijson.JSONError as e:
+    raise ValueError(f"Invalid JSON response: {e}") from e
+  if stack:
+    raise ValueError("Invalid JSON response: incomplete document")
+  return document
+
+class ResponseDecoder:
+  """
+  Decode GraphQL response bodies, at once with json_loads or streamed with ijson (`--stream-json`)
+
+  Streaming keeps the memory of very large pages, such as batches of discussions with all their comments, near the
+  size of a single comment at the cost of more CPU time.
+  """
+  def __init__(self, streaming: bool = False):
+    self.streaming = streaming
+
+  async def decode(self, response) -> Tuple[dict, bytes]:
+    """
+    Returns:
+      The decoded response and its raw body, the body is None when it was streamed
+    """
+    if self.streaming:
+      return await stream_json(response.content), None
+    # Decode the raw body once, without building an intermediate str
+    body = await response.read()
+    return json_loads(body), body
+
+response_decoder = ResponseDecoder()
+
+CACHE_TTLS = {
+  "discussion": 3600,
+  "pullRequest": 3600,
+  "issue": 3600,
+  "commits": 600,
+  "commit": None, # a commit never changes
+}
+
+class ResponseCache:
+  """
+  GraphQL response bodies kept compressed on disk, reused by later runs until their TTL expires
+
+  Entries are keyed by a hash of the endpoint, query, variables and token pool identity, so responses fetched with
+  other tokens are never reused. Reading an entry refreshes its mtime, and once the cache grows over max_size the
+  least recently used entries are deleted. Only complete responses are stored: without errors other than NOT_FOUND,
+  and not streamed. The cache is disabled until open() is called.
+  get() and put() read, compress and write files, post_graphql runs them in the default executor, the LRU index
+  is guarded by a lock.
+  """
+  def __init__(self):
+    self.directory = None
+    self.ttl = None
+    self.max_size = 0
+    self.refresh = False
+    self.entries = collections.OrderedDict() # path -> size, least recently used first
+    self.size = 0
+    self.lock = threading.Lock()
+
+  def open(self, directory: pathlib.Path, ttl=None, max_size: int = 512 * 1024 * 1024, refresh: bool = False):
+    """
+    Use the cache in directory, ttl in seconds (None for no expiry); with refresh entries are replaced but not read
+    """
+    self.directory = directory
+    self.ttl = ttl
+    self.max_size = max_size
+    self.refresh = refresh
+    entries = []
+    for path in directory.glob("*/*.z"):
+      try:
+        stat = path.stat()
+      except OSError:
+        continue
+      entries.append((stat.st_mtime, path, stat.st_size))
+    for _, path, size in sorted(entries):
+      self.entries[path] = size
+      self.size += size
+
+  @property
+  def enabled(self) -> bool:
+    return self.directory is not None
+
+  def key(self, graphql_url, token_pool: TokenPool, query, variables) -> str:
+    return hashlib.sha256(json.dumps([graphql_url, query, variables, token_pool.identity], sort_keys=True).encode('utf-8')).hexdigest()
+
+  def path(self, key: str) -> pathlib.Path:
+    return self.directory / key[:2] / f"{key}.z"
+
+  def get(self, key: str) -> dict:
+    """
+    Returns:
+      The decoded cached response, None if there is no entry or it expired
+    """
+    if not self.enabled or self.refresh:
+      return None
+    path = self.path(key)
+    try:
+      stored_at, body = zlib.decompress(path.read_bytes()).split(b"\n", 1)
+      if self.ttl is not None and time.time() - float(stored_at) > self.ttl:
+        return None
+      result = json_loads(body)
+      os.utime(path)
+    except (OSError, ValueError, zlib.error):
+      return None
+    with self.lock:
+      if path in self.entries:
+        self.entries.move_to_end(path)
+    return result
+
+  def put(self, key: str, result: dict, body: bytes):
+    if not self.enabled or body is None:
+      return
+    if any(error.get("type") != "NOT_FOUND" for error in result.get("errors") or []):
+      return
+    path = self.path(key)
+    data = zlib.compress(f"{time.time()}\n".encode('utf-8') + body)
+    try:
+      path.parent.mkdir(parents=True, exist_ok=True)
+      temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+      temp_path.write_bytes(data)
+      temp_path.replace(path)
+    except OSError as e:
+      print(f"Error writing cache entry {path}: {e}")
+      return
+    evicted = []
+    with self.lock:
+      self.size += len(data) - self.entries.pop(path, 0)
+      self.entries[path] = len(data)
+      while self.size > self.max_size and len(self.entries) > 1:
+        evicted_path, size = self.entries.popitem(last=False)
+        self.size -= size
+        evicted.append(evicted_path)
+    for evicted_path in evicted:
+      try:
+        evicted_path.unlink()
+      except OSError:
+        pass
+
+response_cache = ResponseCache()
+
+def parse_retry_after(headers):
+  """
+  Parse a Retry-After header given either in seconds or as an HTTP date
+  """
+  value = headers.get("Retry-After")
+  if not value:
+    return None
+  try:
+    return max(0.0, float(value))
+  except ValueError:
+    try:
+      return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+      return None
+
+def is_retryable_result(result: dict) -> bool:
+  """
+  A 200 response can still carry transient GraphQL errors, e.g. RATE_LIMITED or a query timeout
+  """
+  for error in result.get("errors") or []:
+    message = error.get("message", "")
+    if error.get("type") == "RATE_LIMITED" or "timeout" in message.lower() or message.startswith("Something went wrong"):
+      return True
+  return False
+
+async def post_graphql(session, graphql_url, token, query, variables) -> dict:
+  """
+  POST a GraphQL document, see post_graphql_request
+
+  Identical requests (same endpoint, query and variables) in flight at the same time are sent once and share the
+  decoded response, which must therefore be treated as read-only.
+  """
+  key = (graphql_url, query, json.dumps(variables, sort_keys=True))
+  return await request_flights.do(key, lambda: post_graphql_request(session, graphql_url, token, query, variables))
+
+async def post_graphql_request(session, graphql_url, token, query, variables) -> dict:
+  """
+  POST a GraphQL document with a token from the TokenPool, throttled by that token's rate limit budget
+
+  Connection errors, truncated or invalid JSON bodies, 5xx/429 responses, secondary rate limit 403s
+  and transient GraphQL errors are retried with exponential backoff and jitter, honoring Retry-After.
+  Each attempt holds a slot of the request_scheduler for the repository being dumped.
+  A response found in the response_cache is returned without any request.
+
+  Returns:
+    The decoded JSON response
+
+  Raises:
+    GraphQLRequestError: The request failed permanently, or the retries were exhausted
+  """
+  token_pool = TokenPool.of(token)
+  loop = asyncio.get_running_loop()
+  if response_cache.enabled:
+    cache_key = response_cache.key(graphql_url, token_pool, query, variables)
+    result = await loop.run_in_executor(None, response_cache.get, cache_key)
+    if result is not None:
+      return result
+  attempt = 0
+  while True:
+    async with request_scheduler.slot(current_repository.get()):
+      token = await token_pool.acquire()
+      headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+        "Accept-Encoding": ACCEPT_ENCODING,
+      }
+      retry_after = None
+      try:
+        async with session.post(graphql_url, headers=headers, json={"query": query, "variables": variables}) as response:
+          if response.status in RETRYABLE_STATUS or response.status == 403:
+            text = await response.text()
+            token_pool.update(token, {}, response.headers)
+            retry_after = parse_retry_after(response.headers)
+            if response.status == 403 and retry_after is None and "rate limit" not in text.lower() and response.headers.get("x-ratelimit-remaining") != "0":
+              raise GraphQLRequestError(f"HTTP {response.status}: {text[:200]}")
+            error = f"HTTP {response.status}: {text[:200]}"
+          elif response.status >= 400:
+            raise GraphQLRequestError(f"HTTP {response.status}: {(await response.text())[:200]}")
+          else:
+            result, body = await response_decoder.decode(response)
+            token_pool.update(token, result, response.headers)
+            if not is_retryable_result(result):
+              if response_cache.enabled:
+                await loop.run_in_executor(None, response_cache.put, cache_key, result, body)
+              return result
+            error = "GraphQL Errors: " + str(result["errors"])
+      except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        error = f"{type(e).__name__}: {e}"
+
+    attempt += 1
+    if attempt > retry_policy.max_retries or not retry_policy.take():
+      raise GraphQLRequestError(f"Giving up after {attempt} attempts, {error}")
+    delay = retry_policy.backoff(attempt, retry_after)
+    if retry_after is not None:
+      # Secondary rate limits apply to the whole token, hold it back for every worker
+      token_pool.pause(token, delay)
+    print(f"Retrying in {delay:.1f}s (attempt {attempt}/{retry_policy.max_retries}) after {error}")
+    await asyncio.sleep(delay)
+
+def build_batch_query(dumptype: str, numbers) -> str:
+  """
+  Build a single query document selecting every number through an aliased field, e.g. `n1234: issue(number: 1234)`
+  """
+  variables = "$owner: String!, $repo: String!, $commentsCursor: String"
+  selections = "\n".join(f"    n{int(number)}: {dumptype}(number: {int(number)}) {{\n      ...{dumptype}Fields\n    }}" for number in numbers)
+  return f"query({variables}) {{\n{rateLimitFields}  repository(owner: $owner, name: $repo) {{\n{selections}\n  }}\n}}\n" + itemQueries[dumptype]["fields"]
+
+def build_updated_query(dumptype: str, numbers) -> str:
+  """
+  Build a query selecting only the updatedAt of every number through an aliased field
+  """
+  selections = "\n".join(f"    n{int(number)}: {dumptype}(number: {int(number)}) {{\n      updatedAt\n    }}" for number in numbers)
+  return f"query($owner: String!, $repo: String!) {{\n{rateLimitFields}  repository(owner: $owner, name: $repo) {{\n{selections}\n  }}\n}}\n"
+
+def build_replies_query(count: int) -> str:
+  """
+  Build a query continuing the replies of several discussion comments, one aliased `node(id:)` per comment
+  """
+  variables = ", ".join(f"$id{i}: ID!, $cursor{i}: String" for i in range(count))
+  selections = "\n".join(f"  c{i}: node(id: $id{i}) {{\n    ... on DiscussionComment {{\n      replies(first: 100, after: $cursor{i}) {{\n        ...discussionRepliesFields\n      }}\n    }}\n  }}" for i in range(count))
+  return f"query({variables}) {{\n{rateLimitFields}{selections}\n}}\n" + discussionRepliesFields
+
+def build_append_query(dumptype: str, count: int) -> str:
+  """
+  Build a query fetching the header and the comments after a stored cursor of several pullRequests or issues,
+  one aliased `node(id:)` per item
+  """
+  variables = ", ".join(f"$id{i}: ID!, $cursor{i}: String" for i in range(count))
+  selections = "\n".join(
+    f"  t{i}: node(id: $id{i}) {{\n    ... on {itemQueries[dumptype]['type']} {{\n"
+    "      id\n      title\n      body\n      author {\n        login\n      }\n      createdAt\n      updatedAt\n      state\n      url\n"
+    f"      comments(first: 100, after: $cursor{i}) {{\n        ...issueCommentsFields\n      }}\n    }}\n  }}"
+    for i in range(count)
+  )
+  return f"query({variables}) {{\n{rateLimitFields}{selections}\n}}\n" + issueCommentsFields
+
+listConnections = {
+  "discussion": "discussions",
+  "pullRequest": "pullRequests",
+  "issue": "issues",
+}
+
+# Each discussion of a listing page or of a batch brings 100 comments with 100 replies each, keep a query under GitHub's
+# 500,000 node limit, also the largest `--page-size` and `--batch-size` allowed
+LIST_PAGE_SIZE = {
+  "discussion": 40,
+  "pullRequest": 100,
+  "issue": 100,
+}
+
+def build_list_query(dumptype: str, numbers_only: bool = False) -> str:
+  """
+  Build the query listing a page of discussions or pullRequests or issues in creation order, each with its first page
+  of comments, or only the number of each item when numbers_only is set
+  """
+  if numbers_only:
+    return f"""query($owner: String!, $repo: String!, $first: Int!, $cursor: String) {{
+{rateLimitFields}  repository(owner: $owner, name: $repo) {{
+    {listConnections[dumptype]}(first: $first, after: $cursor, orderBy: {{field: CREATED_AT, direction: ASC}}) {{
+      pageInfo {{
+        hasNextPage
+        endCursor
+      }}
+      nodes {{
+        number
+      }}
+    }}
+  }}
+}}
+"""
+  return f"""query($owner: String!, $repo: String!, $first: Int!, $cursor: String, $commentsCursor: String) {{
+{rateLimitFields}  repository(owner: $owner, name: $repo) {{
+    {listConnections[dumptype]}(first: $first, after: $cursor, orderBy: {{field: CREATED_AT, direction: ASC}}) {{
+      pageInfo {{
+        hasNextPage
+        endCursor
+      }}
+      nodes {{
+        number
+        ...{dumptype}Fields
+      }}
+    }}
+  }}
+}}
+""" + itemQueries[dumptype]["fields"]
+
+def parse_replies(replies: list) -> List[Reply]:
+  """
+  Convert the replies.nodes of a discussion comment into Reply objects
+  """
+  replies_data = []
+  for reply in replies:
+    if not reply:
+      continue
+    if isinstance(reply, Reply): # already converted while the response was streamed
+      replies_data.append(reply)
+      continue
+    replies_data.append(Reply(
+      id=reply["id"],
+      body=reply["body"],
+      author=reply["author"]["login"] if reply["author"] else "None",
+      created_at=datetime.fromisoformat(reply["createdAt"].replace('Z', '+00:00'))
+    ))
+  return replies_data
+
+def parse_comment(comment: dict) -> Comment:
+  """
+  Convert a decoded comment node into a Comment, with the first page of replies of a discussion comment
+  """
+  return Comment(
+    id=comment["id"],
+    body=comment["body"],
+    author=comment["author"]["login"] if comment["author"] else "None",
+    created_at=datetime.fromisoformat(comment["createdAt"].replace('Z', '+00:00')),
+    replies=parse_replies(comment["replies"]["nodes"]) if "replies" in comment else []
+  )
+
+def parse_comments(comments: list, dumptype: str, reply_pages: list = None) -> List[Comment]:
+  """
+  Convert the comments.nodes of a discussion or pullRequest or issue into Comment objects
+
+  Discussion comments with more than one page of replies are added to reply_pages as (Comment, endCursor).
+  """
+  comments_data = []
+  for comment in comments:
+    if not comment:
+      continue
+    if isinstance(comment, Comment): # already converted while the response was streamed
+      comments_data.append(comment)
+      continue
+
+    comment_data = parse_comment(comment)
+    comments_data.append(comment_data)
+    if dumptype == "discussion" and reply_pages is not None and comment["replies"]["pageInfo"]["hasNextPage"]:
+      reply_pages.append((comment_data, comment["replies"]["pageInfo"]["endCursor"]))
+  return comments_data
+
+def parse_query_result(queryResult: dict, dumptype: str, number: int, reply_pages: list = None) -> QueryResult:
+  """
+  Convert a decoded discussion or pullRequest or issue node (with its first page of comments) into a QueryResult
+  """
+  return QueryResult(
+    url=queryResult["url"],
+    dumptype=dumptype,
+    number=number,
+    state=queryResult["state"] if dumptype != "discussion" else "",
+    title=queryResult["title"],
+    body=queryResult["body"],
+    author=queryResult["author"]["login"] if queryResult["author"] else "None",
+    created_at=datetime.fromisoformat(queryResult["createdAt"].replace('Z', '+00:00')),
+    comments=parse_comments(queryResult["comments"]["nodes"], dumptype, reply_pages),
+    id=queryResult.get("id") or "",
+    updated_at=queryResult.get("updatedAt") or "",
+    comments_cursor=queryResult["comments"]["pageInfo"].get("endCursor"),
+  )
+
+REPLIES_PER_QUERY = 10 # discussion comments whose replies are continued by one aliased query
+REPLIES_CONCURRENCY = 4 # aliased reply queries in flight for a single discussion
+
+async def fetch_remaining_replies(session, graphql_url, token, reply_pages: list, result: QueryResult) -> bool:
+  """
+  Fetch the remaining reply pages of every discussion comment in reply_pages
+
+  Comments are continued REPLIES_PER_QUERY at a time through aliased `node(id:)` selections, and those queries run concurrently.
+  Each round advances every comment by one page of replies, until no comment has a next page.
+
+  Returns:
+    True if every reply page was fetched, False if a page could not be retrieved
+  """
+  complete = True
+
+  async def fetch_chunk(chunk):
+    nonlocal complete
+    if not complete:
+      # The discussion is already failed, its other pages are not worth the rate limit
+      return
+    variables = {}
+    for i, (comment, cursor) in enumerate(chunk):
+      variables[f"id{i}"] = comment.id
+      variables[f"cursor{i}"] = cursor
+    try:
+      page = await post_graphql(session, graphql_url, token, build_replies_query(len(chunk)), variables)
+    except GraphQLRequestError as e:
+      print(f"Error fetching replies of {result.dumptype} {result.number}: {e}")
+      complete = False
+      return
+    data = page.get("data") or {}
+    for i, (comment, cursor) in enumerate(chunk):
+      if not data.get(f"c{i}"):
+        complete = False
+        continue
+      replies = data[f"c{i}"]["replies"]
+      comment.replies.extend(parse_replies(replies["nodes"]))
+      if replies["pageInfo"]["hasNextPage"]:
+        next_pages.append((comment, replies["pageInfo"]["endCursor"]))
+    if page.get("errors"):
+      print(f"GraphQL Errors fetching replies of {result.dumptype} {result.number}: " + str(page["errors"]))
+
+  while reply_pages and complete:
+    next_pages = []
+    await run_concurrently(chunked(reply_pages, REPLIES_PER_QUERY), fetch_chunk, REPLIES_CONCURRENCY)
+    reply_pages = next_pages
+  return complete
+
+async def fetch_remaining_comments(session, graphql_url, token, queryResult: dict, result: QueryResult, reply_pages: list = None) -> bool:
+  """
+  Follow comments.pageInfo of an already decoded item and append the remaining comment pages to result,
+  then complete the replies of every discussion comment collected in reply_pages
+
+  Returns:
+    True if every comment and reply page was fetched, False if a page could not be retrieved
+  """
+  dumptype = result.dumptype
+  variables = {
+    "id": queryResult["id"],
+  }
+  page_info = queryResult["comments"]["pageInfo"]
+  while page_info["hasNextPage"]:
+    variables["commentsCursor"] = page_info["endCursor"]
+    page = await post_graphql(session, graphql_url, token, itemQueries[dumptype]["comments"], variables)
+    if page.get("errors") or not (page.get("data") or {}).get("node"):
+      print(f"GraphQL Errors fetching comments of {dumptype} {result.number}: " + str(page.get("errors")))
+      return False
+
+    comments = page["data"]["node"]["comments"]
+    result.comments.extend(parse_comments(comments["nodes"], dumptype, reply_pages))
+    page_info = comments["pageInfo"]
+    result.comments_cursor = page_info["endCursor"] or result.comments_cursor
+
+  if reply_pages:
+    return await fetch_remaining_replies(session, graphql_url, token, reply_pages, result)
+  return True
+
+async def complete_query_result(session, graphql_url, token, dumptype: str, number: int, queryResult: dict):
+  """
+  Decode an item from its first page and fetch its remaining comment and reply pages
+
+  Returns:
+    QueryResult if successful, None if a page could not be retrieved or an error occurs
+  """
+  try:
+    reply_pages = []
+    result = parse_query_result(queryResult, dumptype, number, reply_pages)
+    if await fetch_remaining_comments(session, graphql_url, token, queryResult, result, reply_pages):
+      return result
+  except Exception as e:
+    print(traceback.format_exc())
+    print(f"Error fetching {dumptype} {number}: {e}")
+  return None
+
+class OutputLock:
+  """
+  Exclusive lock on an output directory held while a repository is dumped into it
+
+  A second run on the same directory, e.g. a cron job overlapping the next one, skips the repository instead of
+  writing the same markdown files, manifest, commit store and journal. The lock is released by the operating system
+  when the process ends, even after a crash.
+  """
+  FILENAME = ".lock"
+
+  def __init__(self, output_directory: pathlib.Path):
+    self.path = output_directory / self.FILENAME
+    self.file = None
+
+  def acquire(self) -> bool:
+    """
+    Returns:
+      True if the lock was taken, False if another process holds it
+    """
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    self.file = self.path.open("a+")
+    try:
+      self.file.seek(0)
+      if fcntl is not None:
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+      else:
+        msvcrt.locking(self.file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+      self.release()
+      return False
+    return True
+
+  def release(self):
+    if self.file is not None:
+      self.file.close()
+      self.file = None
+
+class Manifest:
+  """
+  SQLite record of the discussions or pullRequests or issues dumped into an output directory
+
+  One row per item with its node id, updatedAt, comment count, markdown path and content hash, so later runs only
+  fully fetch the items whose updatedAt changed. The endCursor of the last comment page and a hash of the header
+  let a later run fetch only the newer comments of a pullRequest or issue and append them to its markdown file.
+  Rows are only written once their markdown file is written, and are committed in groups of COMMIT_EVERY and on close().
+  The numbers found not to exist are kept with the time they were checked, so later runs skip them for a while.
+  """
+  FILENAME = ".manifest.sqlite"
+  COMMIT_EVERY = 100
+
+  def __init__(self, output_directory: pathlib.Path):
+    output_directory.mkdir(parents=True, exist_ok=True)
+    self.connection = sqlite3.connect(output_directory / self.FILENAME)
+    self.connection.execute("PRAGMA journal_mode=WAL")
+    self.connection.execute("PRAGMA synchronous=NORMAL")
+    self.connection.execute("""
+      CREATE TABLE IF NOT EXISTS items (
+        dumptype TEXT NOT NULL,
+        number INTEGER NOT NULL,
+        node_id TEXT,
+        updated_at TEXT,
+        comment_count INTEGER,
+        path TEXT,
+        content_hash TEXT,
+        comments_cursor TEXT,
+        header_hash TEXT,
+        PRIMARY KEY (dumptype, number)
+      )
+    """)
+    self.connection.execute("""
+      CREATE TABLE IF NOT EXISTS not_found (
+        dumptype TEXT NOT NULL,
+        number INTEGER NOT NULL,
+        checked_at REAL NOT NULL,
+        PRIMARY KEY (dumptype, number)
+      )
+    """)
+    # Manifests written before the cursor columns existed are migrated in place
+    columns = {row[1] for row in self.connection.execute("PRAGMA table_info(items)")}
+    for column in ["comments_cursor", "header_hash"]:
+      if column not in columns:
+        self.connection.execute(f"ALTER TABLE items ADD COLUMN {column} TEXT")
+    self.pending = 0
+
+  @staticmethod
+  def header_hash(queryResult: QueryResult) -> str:
+    """
+    Hash of everything rendered above the comments, a change means the markdown file can't be appended to
+    """
+    header = [queryResult.title, queryResult.url, queryResult.author, queryResult.created_at.isoformat(), queryResult.state, queryResult.body]
+    return hashlib.sha256("\n".join(header).encode('utf-8')).hexdigest()
+
+  def is_unchanged(self, dumptype: str, number: int, updated_at: str) -> bool:
+    """
+    Whether the item was dumped with this updatedAt and its markdown file is still there
+    """
+    row = self.connection.execute("SELECT updated_at, path FROM items WHERE dumptype = ? AND number = ?", (dumptype, number)).fetchone()
+    return row is not None and updated_at is not None and row[0] == updated_at and pathlib.Path(row[1]).exists()
+
+  def has_item(self, dumptype: str, number: int) -> bool:
+    return self.connection.execute("SELECT 1 FROM items WHERE dumptype = ? AND number = ?", (dumptype, number)).fetchone() is not None
+
+  def has_items(self, dumptype: str) -> bool:
+    return self.connection.execute("SELECT 1 FROM items WHERE dumptype = ? LIMIT 1", (dumptype,)).fetchone() is not None
+
+  def highest(self, dumptype: str) -> int:
+    return self.connection.execute("SELECT MAX(number) FROM items WHERE dumptype = ?", (dumptype,)).fetchone()[0] or 0
+
+  def not_found(self, dumptype: str, ttl: float) -> set:
+    """
+    Numbers found not to exist less than ttl seconds ago
+    """
+    rows = self.connection.execute("SELECT number FROM not_found WHERE dumptype = ? AND checked_at > ?", (dumptype, time.time() - ttl))
+    return {row[0] for row in rows}
+
+  def record_not_found(self, dumptype: str, numbers):
+    checked_at = time.time()
+    self.connection.executemany(
+      "INSERT OR REPLACE INTO not_found VALUES (?, ?, ?)",
+      [(dumptype, number, checked_at) for number in numbers],
+    )
+    self._committed()
+
+  def thread(self, dumptype: str, number: int):
+    """
+    The stored state of an item whose markdown file can have newer comments appended, once is_intact() confirms it
+
+    Returns:
+      dict with node_id, comment_count, comments_cursor, header_hash, path and content_hash,
+      None if the item was never dumped with a cursor
+    """
+    row = self.connection.execute(
+      "SELECT node_id, comment_count, comments_cursor, header_hash, path, content_hash FROM items WHERE dumptype = ? AND number = ?",
+      (dumptype, number),
+    ).fetchone()
+    if row is None or not row[0] or row[3] is None:
+      return None
+    return {"node_id": row[0], "comment_count": row[1], "comments_cursor": row[2], "header_hash": row[3], "path": pathlib.Path(row[4]), "content_hash": row[5]}
+
+  @staticmethod
+  def is_intact(thread: dict) -> bool:
+    """
+    Whether the markdown file of a thread is still the one recorded, reads the whole file so it is run in an executor
+    """
+    try:
+      text = read_markdown(thread["path"])
+    except OSError:
+      return False
+    return hashlib.sha256(text.encode('utf-8')).hexdigest() == thread["content_hash"]
+
+  def record(self, queryResult: QueryResult, markdown_path: pathlib.Path, full_markdown_text: str):
+    self.connection.execute(
+      """
+      INSERT OR REPLACE INTO items (dumptype, number, node_id, updated_at, comment_count, path, content_hash, comments_cursor, header_hash)
+      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+      """,
+      (
+        queryResult.dumptype,
+        queryResult.number,
+        queryResult.id,
+        queryResult.updated_at,
+        (queryResult.comments_offset or 0) + len(queryResult.comments),
+        str(markdown_path),
+        hashlib.sha256(full_markdown_text.encode('utf-8')).hexdigest(),
+        queryResult.comments_cursor,
+        self.header_hash(queryResult),
+      ),
+    )
+    self.connection.execute("DELETE FROM not_found WHERE dumptype = ? AND number = ?", (queryResult.dumptype, queryResult.number))
+    self._committed()
+
+  def touch(self, queryResult: QueryResult):
+    """
+    Record a new updatedAt (and cursor) of an item whose markdown file didn't change
+    """
+    self.connection.execute(
+      "UPDATE items SET updated_at = ?, comments_cursor = ? WHERE dumptype = ? AND number = ?",
+      (queryResult.updated_at, queryResult.comments_cursor, queryResult.dumptype, queryResult.number),
+    )
+    self._committed()
+
+  def _committed(self):
+    self.pending += 1
+    if self.pending >= self.COMMIT_EVERY:
+      self.connection.commit()
+      self.pending = 0
+
+  def close(self):
+    self.connection.commit()
+    self.connection.close()
+
+UPDATED_PER_QUERY = 100 # numbers whose updatedAt is checked by one aliased query
+
+async def fetch_updated_at(session, graphql_url, token, owner, repo, dumptype, numbers) -> dict:
+  """
+  Fetch only the updatedAt of several discussions or pullRequests or issues with a single aliased GraphQL request
+
+  Returns:
+    dict mapping each requested number to its updatedAt, or None if not found
+
+  Raises:
+    GraphQLRequestError: The request failed or returned errors other than NOT_FOUND
+  """
+  numbers = list(numbers)
+  variables = {
+    "owner": owner,
+    "repo": repo,
+  }
+  result = await post_graphql(session, graphql_url, token, build_updated_query(dumptype, numbers), variables)
+  errors = [error for error in result.get("errors") or [] if error.get("type") != "NOT_FOUND"]
+  if errors:
+    raise GraphQLRequestError("GraphQL Errors: " + str(errors))
+  repository = (result.get("data") or {}).get("repository") or {}
+  return {number: (repository.get(f"n{number}") or {}).get("updatedAt") for number in numbers}
+
+APPEND_PER_QUERY = 10 # items whose newer comments are fetched by one aliased query
+
+async def fetch_appended_comments(session, graphql_url, token, dumptype, threads: dict) -> dict:
+  """
+  Fetch only the comments added after the stored cursor of several pullRequests or issues with a single aliased
+  GraphQL request, following the pages of the items with more than one page of new comments
+
+  Args:
+    threads (dict): mapping of each number to its stored state, see Manifest.thread()
+
+  Returns:
+    dict mapping each number to a QueryResult holding only the new comments (comments_offset is the stored count),
+    or None if the item must be fetched again in full: its header changed, comments were deleted or it failed
+  """
+  numbers = list(threads)
+  variables = {}
+  for i, number in enumerate(numbers):
+    variables[f"id{i}"] = threads[number]["node_id"]
+    variables[f"cursor{i}"] = threads[number]["comments_cursor"]
+  result = await post_graphql(session, graphql_url, token, build_append_query(dumptype, len(numbers)), variables)
+  if result.get("errors"):
+    print(f"GraphQL Errors fetching new comments of {dumptype}: " + str(result.get("errors")))
+  data = result.get("data") or {}
+
+  results = {}
+  for i, number in enumerate(numbers):
+    thread = threads[number]
+    results[number] = None
+    node = data.get(f"t{i}")
+    if not node or "comments" not in node:
+      continue
+    try:
+      queryResult = parse_query_result(node, dumptype, number)
+      queryResult.comments_offset = thread["comment_count"]
+      if not await fetch_remaining_comments(session, graphql_url, token, node, queryResult):
+        continue
+    except Exception as e:
+      print(traceback.format_exc())
+      print(f"Error fetching new comments of {dumptype} {number}: {e}")
+      continue
+    # An edited header or a deleted comment can't be appended, edits of older comments go unnoticed
+    if Manifest.header_hash(queryResult) != thread["header_hash"]:
+      continue
+    if node["comments"]["totalCount"] != thread["comment_count"] + len(queryResult.comments):
+      continue
+    queryResult.comments_cursor = queryResult.comments_cursor or thread["comments_cursor"]
+    results[number] = queryResult
+  return results
+
+async def fetch_github_batch(session, graphql_url, token, owner, repo, dumptype, numbers, not_found: set = None, concurrency: int = 4):
+  """
+  Fetch several discussions or pullRequests or issues with a single aliased GraphQL request
+
+  Every number is selected as its own alias, so a NOT_FOUND number only empties its own alias.
+  Items with more than one page of comments are completed afterwards, `concurrency` of them at a time.
+  The numbers GitHub reported as NOT_FOUND are added to not_found.
+
+  Returns:
+    dict mapping each requested number to its QueryResult, or None if not found or an error occurs
+  """
+  numbers = list(numbers)
+  results = dict.fromkeys(numbers)
+
+  async def complete(item):
+    number, queryResult = item
+    results[number] = await complete_query_result(session, graphql_url, token, dumptype, number, queryResult)
+
+  try:
+    variables = {
+      "owner": owner,
+      "repo": repo,
+    }
+    result = await post_graphql(session, graphql_url, token, build_batch_query(dumptype, numbers), variables)
+
+    errors = [error for error in result.get("errors") or [] if error.get("type") != "NOT_FOUND"]
+    if errors:
+      print("GraphQL Errors: " + str(errors))
+
+    repository = (result.get("data") or {}).get("repository") or {}
+    if not_found is not None:
+      # The path of a NOT_FOUND error ends with the alias of the missing number
+      missing = {str((error.get("path") or [""])[-1]) for error in result.get("errors") or [] if error.get("type") == "NOT_FOUND"}
+      not_found.update(number for number in numbers if f"n{number}" in missing and not repository.get(f"n{number}"))
+    await run_concurrently(((number, repository[f"n{number}"]) for number in numbers if repository.get(f"n{number}")), complete, concurrency)
+  except Exception as e:
+    print(traceback.format_exc())
+    print(f"Error fetching {dumptype} {numbers[0]}-{numbers[-1]}: {e}")
+  return results
+
+async def fetch_latest_number(session, graphql_url, token, owner, repo, dumptype):
+  """
+  Fetch the number of the most recently created discussion or pullRequest or issue
+
+  Returns:
+    The latest number, None if the repository has no item of that type
+
+  Raises:
+    GraphQLRequestError: The number could not be retrieved
+  """
+  query = f"""query($owner: String!, $repo: String!) {{
+{rateLimitFields}  repository(owner: $owner, name: $repo) {{
+    {listConnections[dumptype]}(first: 1, orderBy: {{field: CREATED_AT, direction: DESC}}) {{
+      nodes {{
+        number
+      }}
+    }}
+  }}
+}}
+"""
+  result = await post_graphql(session, graphql_url, token, query, {"owner": owner, "repo": repo})
+  if result.get("errors") or not (result.get("data") or {}).get("repository"):
+    raise GraphQLRequestError("GraphQL Errors: " + str(result.get("errors")))
+  nodes = result["data"]["repository"][listConnections[dumptype]]["nodes"]
+  return nodes[0]["number"] if nodes else None
+
+async def list_github_items(session, graphql_url, token, owner, repo, dumptype, numbers: IntervalSet = None, page_size=None, concurrency: int = 4):
+  """
+  Stream every existing discussion or pullRequest or issue of the repository through its listing connection
+
+  Items are listed in creation order, page_size at a time with their first page of comments, so only existing items
+  are fetched instead of probing every number. When numbers is given, only the numbers of the items are listed, 100 at
+  a time, and the existing requested items are fetched page_size at a time with the aliased batch query, so the items
+  outside the range cost a slim page instead of their comments. Unless the range is open-ended, the listing stops at
+  the first page whose items are all newer than the largest requested number.
+  The items of a page are completed `concurrency` at a time.
+
+  Yields:
+    (number, QueryResult) for every listed item, QueryResult is None if its comments could not be completed
+
+  Raises:
+    GraphQLRequestError: A listing page could not be retrieved
+  """
+  wanted = numbers if numbers else None
+  last_number = numbers.last if numbers else None
+  page_size = page_size or LIST_PAGE_SIZE[dumptype]
+  variables = {
+    "owner": owner,
+    "repo": repo,
+    "first": page_size if wanted is None else 100,
+  }
+  connection = listConnections[dumptype]
+  query = build_list_query(dumptype, numbers_only=wanted is not None)
+  has_next_page = True
+  while has_next_page:
+    result = await post_graphql(session, graphql_url, token, query, variables)
+    if result.get("errors") or not (result.get("data") or {}).get("repository"):
+      raise GraphQLRequestError("GraphQL Errors: " + str(result.get("errors")))
+
+    items = result["data"]["repository"][connection]
+    nodes = [node for node in items["nodes"] if node]
+    if wanted is None:
+      query_results = {}
+
+      async def complete(node):
+        query_results[node["number"]] = await complete_query_result(session, graphql_url, token, dumptype, node["number"], node)
+
+      await run_concurrently(nodes, complete, concurrency)
+      for node in nodes:
+        yield node["number"], query_results[node["number"]]
+    else:
+      selected = [node["number"] for node in nodes if node["number"] in wanted]
+      for batch in chunked(selected, page_size):
+        query_results = await fetch_github_batch(session, graphql_url, token, owner, repo, dumptype, batch, concurrency=concurrency)
+        for number in batch:
+          yield number, query_results[number]
+
+    has_next_page = items["pageInfo"]["hasNextPage"]
+    variables["cursor"] = items["pageInfo"]["endCursor"]
+    if last_number is not None and nodes and all(node["number"] > last_number for node in nodes):
+      return
+
+async def fetch_organization_repositories(session, graphql_url, token, org) -> List[str]:
+  """
+  List the names of all the repositories of an organization
+
+  Raises:
+    GraphQLRequestError: The organization is not found or a page could not be fetched
+  """
+  names = []
+  variables = {"org": org}
+  while True:
+    result = await post_graphql(session, graphql_url, token, queryOrganizationRepositories, variables)
+    if result.get("errors") or not (result.get("data") or {}).get("organization"):
+      raise GraphQLRequestError("GraphQL Errors: " + str(result.get("errors")))
+    repositories = result["data"]["organization"]["repositories"]
+    names.extend(node["name"] for node in repositories["nodes"] if node)
+    if not repositories["pageInfo"]["hasNextPage"]:
+      return names
+    variables["cursor"] = repositories["pageInfo"]["endCursor"]
+
+def parse_commit(node: dict, dumptype: str) -> CommitQueryResult:
+  """
+  Convert a decoded commit node into a CommitQueryResult
+  """
+  return CommitQueryResult(
+    dumptype=dumptype,
+    oid=node["oid"],
+    message=node["message"],
+    committedDate=datetime.fromisoformat(node["committedDate"].replace('Z', '+00:00')),
+    author=node["author"]["name"] if node["author"] else "None",
+    parents=[parent["oid"] for parent in (node.get("parents") or {}).get("nodes") or []],
+  )
+
+class CommitStore:
+  """
+  Commits already dumped from a repository, kept next to the markdown files so later runs only fetch the new commits
+
+  Every known commit is stored with its parent oids, together with the head oid last dumped for each branch.
+  A head is only recorded once all of its ancestry is stored, so the history of any stored head can be rebuilt
+  from the store alone, and branches sharing history share the stored commits.
+  """
+  FILENAME = ".commits.json.gz"
+
+  def __init__(self, path: pathlib.Path):
+    self.path = path
+    self.heads = {}
+    self.commits = {}
+
+  @classmethod
+  def load(cls, output_directory: pathlib.Path) -> "CommitStore":
+    """
+    Read the store of an output directory, an empty store is returned if there is none yet or it is unreadable
+    """
+    store = cls(output_directory / cls.FILENAME)
+    if not store.path.exists():
+      return store
+    try:
+      data = json_loads(gzip.decompress(store.path.read_bytes()))
+      commits = {
+        oid: CommitQueryResult(
+          dumptype="commits",
+          oid=oid,
+          message=commit["message"],
+          committedDate=datetime.fromisoformat(commit["committedDate"]),
+          author=commit["author"],
+          parents=commit["parents"],
+        )
+        for oid, commit in data["commits"].items()
+      }
+      store.heads, store.commits = data["heads"], commits
+    except (OSError, ValueError, KeyError) as e:
+      print(f"Ignoring unreadable commit store {store.path}: {e}")
+    return store
 
-queryCommits = """
-query($owner: String!, $repo: String!, $branch: String!, $historyCursor: String) {
-  repository(owner: $owner, name: $repo) {
-    ref(qualifiedName: $branch) {
-      target {
-        ... on Commit {
-          history(first: 100, after: $historyCursor) {
-            pageInfo {
-              hasNextPage
-              endCursor
-            }
-            edges {
-              node {
-                message
-                oid
-                committedDate
-                author {
-                  name
-                }
-              }
-            }
-          }
+  def save(self):
+    """
+    Write the commits reachable from the stored heads through a temporary file, an interrupted save keeps the
+    previous store
+    """
+    reachable = set()
+    for head in self.heads.values():
+      reachable |= self.reachable(head)[0]
+    data = {
+      "heads": self.heads,
+      "commits": {
+        oid: {
+          "message": commit.message,
+          "committedDate": commit.committedDate.isoformat(),
+          "author": commit.author,
+          "parents": commit.parents,
         }
-      }
+        for oid, commit in self.commits.items() if oid in reachable
+      },
     }
-  }
-}
-"""
+    self.path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = self.path.with_name(self.path.name + ".tmp")
+    temp_path.write_bytes(gzip.compress(json.dumps(data).encode('utf-8')))
+    temp_path.replace(self.path)
 
-queryCommitBySHA = """
-query($owner: String!, $repo: String!, $sha: GitObjectID!) {
-  repository(owner: $owner, name: $repo) {
-    object(oid: $sha) {
-      ... on Commit {
-        message
-        oid
-        committedDate
-        author {
-          name
-        }
-        url
-      }
+  def add(self, commits):
+    for commit in commits:
+      self.commits[commit.oid] = commit
+
+  def reachable(self, head: str) -> Tuple[set, bool]:
+    """
+    Oids of the stored commits reachable from head through their parents, and whether none of them is missing
+    """
+    seen, missing = self._walk(head)
+    return seen, not missing
+
+  def missing(self, head: str) -> set:
+    """
+    Oids of the history of head referenced as a parent (or as the head) but not stored
+    """
+    return self._walk(head)[1]
+
+  def _walk(self, head: str) -> Tuple[set, set]:
+    seen = set()
+    missing = set()
+    stack = [head]
+    while stack:
+      oid = stack.pop()
+      if oid in seen or oid in missing:
+        continue
+      if oid not in self.commits:
+        missing.add(oid)
+        continue
+      seen.add(oid)
+      stack.extend(self.commits[oid].parents)
+    return seen, missing
+
+  def history(self, head: str) -> List[CommitQueryResult]:
+    """
+    Commits reachable from head sorted by committedDate (latest first), None if part of the history is missing
+    """
+    seen, complete = self.reachable(head)
+    if not complete:
+      return None
+    # oid breaks committedDate ties, the order must not depend on how the commits were fetched
+    return sorted((self.commits[oid] for oid in seen), key=lambda commit: (commit.committedDate, commit.oid), reverse=True)
+
+class Checkpoint:
+  """
+  Journal of the progress of a run, appended to `.checkpoint.jsonl` inside the output directory
+
+  Every written discussion or pullRequest or issue and every fetched page of a commit history is appended as one
+  JSON line and flushed at once, so a run resumed with `--resume` after a crash skips the items already written
+  and continues every commit history from its last cursor. A line cut short by the crash is ignored.
+  The journal is removed once the run completes, a run without `--resume` starts a new one.
+  """
+  FILENAME = ".checkpoint.jsonl"
+
+  def __init__(self, output_directory: pathlib.Path, resume: bool = False):
+    self.path = output_directory / self.FILENAME
+    self.items = set()
+    self.pages = {}
+    output_directory.mkdir(parents=True, exist_ok=True)
+    complete_line = True
+    if resume and self.path.exists():
+      complete_line = self._load()
+    self.journal = self.path.open("a" if resume else "w", encoding='utf-8')
+    if not complete_line:
+      self.journal.write("\n")
+
+  def _load(self) -> bool:
+    """
+    Read the journal of the interrupted run
+
+    Returns:
+      True if its last line is complete
+    """
+    text = self.path.read_text(encoding='utf-8')
+    for line in text.splitlines():
+      try:
+        entry = json_loads(line)
+      except ValueError:
+        continue
+      if "item" in entry:
+        self.items.add(tuple(entry["item"]))
+      elif "pages" in entry:
+        nodes = self.pages[entry["pages"]][0] if entry["pages"] in self.pages else []
+        nodes.extend(entry["nodes"])
+        self.pages[entry["pages"]] = (nodes, entry["cursor"], entry["hasNextPage"])
+    return not text or text.endswith("\n")
+
+  def _append(self, entry: dict):
+    self.journal.write(json.dumps(entry) + "\n")
+    self.journal.flush()
+
+  def item(self, dumptype: str, number: int):
+    self._append({"item": [dumptype, number]})
+
+  def page(self, key: str, nodes: list, cursor: str, has_next_page: bool):
+    self._append({"pages": key, "nodes": nodes, "cursor": cursor, "hasNextPage": has_next_page})
+
+  def resumed_pages(self, key: str):
+    """
+    The pages of a pagination journaled by the interrupted run
+
+    Returns:
+      (nodes of every page, cursor of the last page, whether there is a next page), None if nothing was journaled
+    """
+    return self.pages.pop(key, None)
+
+  def close(self, completed: bool = True):
+    self.journal.close()
+    if completed:
+      self.path.unlink(missing_ok=True)
+
+COMMITS_PER_SHARD = 1000 # target size of a history window, shorter histories are walked sequentially
+
+async def fetch_branch_head(session, graphql_url, token, variables: dict, branch: str):
+  """
+  Probe a branch for its head commit, the head's history size and the repository creation date
+
+  Returns:
+    repository dict of the probe query
+    None if the branch is not found or an error occurs
+  """
+  try:
+    probe = await post_graphql(session, graphql_url, token, queryCommitsProbe, variables)
+    if probe.get("errors"):
+      print("GraphQL Errors: " + str(probe["errors"]))
+      return None
+    repository = (probe.get("data") or {}).get("repository") or {}
+    if not repository.get("ref"):
+      return None
+    return repository
+  except Exception as e:
+    print(traceback.format_exc())
+    print(f"Error fetching commits {branch}: {e}")
+    return None
+
+async def fetch_new_commits(session, graphql_url, token, variables: dict, branch: str, head: str, store: CommitStore, checkpoint: Checkpoint = None, missing: set = ()):
+  """
+  Paginate the history of a branch from its head until every fetched commit only has parents already in the store
+
+  History is returned children first, so the walk ends on the page where the last unknown parent is reached.
+  Commits are added to the store as soon as they are fetched, a branch fetched concurrently stops as soon as it
+  reaches the history shared with this one. No page is requested at all if the head itself is already stored.
+  Every page is journaled in checkpoint, a resumed walk continues after the last page journaled.
+  The oids in missing are waited for as well, which fills the gaps of a history already stored.
+
+  Returns:
+    number of commits added to the store
+    None if a page could not be fetched
+  """
+  fetched = 0
+  pending = {head} | set(missing)
+  variables = dict(variables)
+  key = f"walk {branch} {head}"
+  resumed = checkpoint.resumed_pages(key) if checkpoint else None
+  if resumed:
+    nodes, variables["historyCursor"], has_next_page = resumed
+    for node in nodes:
+      commit_data = parse_commit(node, "commits")
+      if commit_data.oid in store.commits:
+        continue
+      store.commits[commit_data.oid] = commit_data
+      pending.update(commit_data.parents)
+      fetched += 1
+    if not has_next_page:
+      pending = set()
+  pending = {oid for oid in pending if oid not in store.commits}
+  try:
+    while pending:
+      result = await post_graphql(session, graphql_url, token, queryCommits, variables)
+      if result.get("errors") or not (result.get("data") or {}).get("repository", {}).get("ref"):
+        print("GraphQL Errors: " + str(result.get("errors")))
+        return None
+
+      history_data = result["data"]["repository"]["ref"]["target"]["history"]
+      for edge in history_data["edges"]:
+        commit_data = parse_commit(edge["node"], "commits")
+        if commit_data.oid in store.commits:
+          continue
+        store.commits[commit_data.oid] = commit_data
+        pending.update(commit_data.parents)
+        fetched += 1
+      pending = {oid for oid in pending if oid not in store.commits}
+      if not pending and missing:
+        # A filled gap can uncover another one further down the history, the walk goes on from this page
+        pending = store.missing(head)
+      if checkpoint:
+        checkpoint.page(key, [edge["node"] for edge in history_data["edges"]], history_data["pageInfo"]["endCursor"], history_data["pageInfo"]["hasNextPage"])
+
+      if not history_data["pageInfo"]["hasNextPage"]:
+        break
+      variables["historyCursor"] = history_data["pageInfo"]["endCursor"]
+  except Exception as e:
+    print(traceback.format_exc())
+    print(f"Error fetching new commits {branch}: {e}")
+    return None
+  return fetched
+
+async def fetch_commit_windows(session, graphql_url, token, variables: dict, branch: str, repository: dict, store: CommitStore, concurrency: int = 1, checkpoint: Checkpoint = None) -> bool:
+  """
+  Fetch the whole history of a branch, split into committedDate windows that are paginated concurrently
+
+  The span between the oldest commit and the head is cut into `since`/`until` windows of roughly
+  COMMITS_PER_SHARD commits; the oldest window has no `since` and the newest no `until`, so commits dated outside
+  the span are still fetched. The oldest commit is requested with a cursor at the end of the history, the repository
+  creation date is used if it can't be fetched. Commits on a window boundary may be returned twice and are
+  deduplicated by oid.
+  Every page is journaled in checkpoint, a resumed window continues after the last page journaled.
+
+  Returns:
+    True once all the commits are added to the store, False if a window could not be fetched
+  """
+  head = repository["ref"]["target"]
+  newest = datetime.fromisoformat(head["committedDate"].replace('Z', '+00:00'))
+  oldest = datetime.fromisoformat(repository["createdAt"].replace('Z', '+00:00'))
+  shards = min(concurrency * 4, -(-head["history"]["totalCount"] // COMMITS_PER_SHARD))
+  windows = [(None, None)]
+  if concurrency > 1 and shards > 1:
+    # The history of an imported or mirrored repository predates its creation on GitHub, a history cursor is
+    # "<oid> <offset>" so the one before the last commit returns the oldest commit
+    try:
+      result = await post_graphql(session, graphql_url, token, queryCommits, dict(variables, historyCursor=f"{head['oid']} {head['history']['totalCount'] - 2}"))
+      edges = result["data"]["repository"]["ref"]["target"]["history"]["edges"]
+      if edges:
+        oldest = datetime.fromisoformat(edges[-1]["node"]["committedDate"].replace('Z', '+00:00'))
+    except Exception as e:
+      print(f"Error fetching the oldest commit of {branch}, splitting its history from the repository creation: {e}")
+  if concurrency > 1 and shards > 1 and newest > oldest:
+    step = (newest - oldest) / shards
+    bounds = [(oldest + step * i).strftime('%Y-%m-%dT%H:%M:%SZ') for i in range(1, shards)]
+    windows = list(zip([None] + bounds, bounds + [None]))
+
+  commits_data = {}
+  failed = False
+
+  async def fetch_window(window):
+    nonlocal failed
+    since, until = window
+    window_variables = dict(variables, since=since, until=until)
+    has_next_page = True
+    key = f"window {branch} {head['oid']} {since or ''}..{until or ''}"
+    resumed = checkpoint.resumed_pages(key) if checkpoint else None
+    if resumed:
+      nodes, window_variables["historyCursor"], has_next_page = resumed
+      for node in nodes:
+        commit_data = parse_commit(node, "commits")
+        commits_data[commit_data.oid] = commit_data
+    try:
+      while has_next_page and not failed:
+        result = await post_graphql(session, graphql_url, token, queryCommits, window_variables)
+        if result.get("errors") or not (result.get("data") or {}).get("repository", {}).get("ref"):
+          print("GraphQL Errors: " + str(result.get("errors")))
+          failed = True
+          return
+
+        history_data = result["data"]["repository"]["ref"]["target"]["history"]
+        for edge in history_data["edges"]:
+          commit_data = parse_commit(edge["node"], "commits")
+          commits_data[commit_data.oid] = commit_data
+
+        has_next_page = history_data["pageInfo"]["hasNextPage"]
+        window_variables["historyCursor"] = history_data["pageInfo"]["endCursor"]
+        if checkpoint:
+          checkpoint.page(key, [edge["node"] for edge in history_data["edges"]], window_variables["historyCursor"], has_next_page)
+    except Exception as e:
+      print(traceback.format_exc())
+      print(f"Error fetching commits {branch} {since or ''}..{until or ''}: {e}")
+      failed = True
+
+  await run_concurrently(windows, fetch_window, concurrency)
+  if failed:
+    return False
+  store.add(commits_data.values())
+  return True
+
+async def fetch_branch_histories(session, graphql_url, token, owner, repo, branches: List[str], concurrency: int = 1, store: CommitStore = None, checkpoint: Checkpoint = None) -> dict:
+  """
+  Fetch the history of several branches into a shared commit store
+
+  Branches are synced concurrently and each one only paginates until it reaches commits already in the store,
+  fetched by an earlier run or by another branch of this run. With an empty store the first branch is fetched
+  in full with concurrent history windows before the others start, so they all stop at the ancestry it shares.
+  Once every branch is synced, its history is assembled from the store by following the parents of its head.
+
+  Returns:
+    dict of branch to list of CommitQueryResult sorted by committedDate (latest first),
+    None for a branch that is not found or whose history could not be fetched completely
+  """
+  if store is None:
+    store = CommitStore(None)
+  heads = {}
+
+  async def sync_branch(branch, window_concurrency=1):
+    variables = {
+      "owner": owner,
+      "repo": repo,
+      "branch": branch,
     }
-  }
-}
-"""
+    repository = await fetch_branch_head(session, graphql_url, token, variables, branch)
+    if not repository:
+      return
+    head = repository["ref"]["target"]["oid"]
+    if store.commits:
+      fetched = await fetch_new_commits(session, graphql_url, token, variables, branch, head, store, checkpoint)
+      if fetched is None:
+        return
+      known_head = store.heads.get(branch)
+      print(f"Branch {branch}: {fetched} new commits" + (f" since {known_head[:7]}" if known_head else ""))
+    else:
+      if not await fetch_commit_windows(session, graphql_url, token, variables, branch, repository, store, window_concurrency, checkpoint):
+        return
+      missing = store.missing(head)
+      if missing:
+        # A commit dated before its child (clock skew) can fall outside every window, the walk from the head fills
+        # in the ancestry the windows missed
+        print(f"Branch {branch}: {len(missing)} commits missing from the history windows, walking the history from the head")
+        if await fetch_new_commits(session, graphql_url, token, variables, branch, head, store, checkpoint, missing) is None:
+          return
+    heads[branch] = head
+
+  branches = list(dict.fromkeys(branches))
+  remaining = list(branches)
+  if not store.commits and remaining:
+    await sync_branch(remaining.pop(0), concurrency)
+  await run_concurrently(remaining, sync_branch, concurrency)
+
+  histories = {}
+  for branch in branches:
+    # A branch that stopped on history of a failed branch is incomplete and reported as failed
+    histories[branch] = store.history(heads[branch]) if branch in heads else None
+    if histories[branch] is not None:
+      store.heads[branch] = heads[branch]
+  return histories
+
+async def fetch_commit_history(session, graphql_url, token, owner, repo, branch, concurrency: int = 1, store: CommitStore = None):
+  """
+  Fetch the history of a single branch, see fetch_branch_histories
+
+  Returns:
+    list of CommitQueryResult sorted by committedDate (latest first)
+    None if the branch is not found or its history could not be fetched
+  """
+  histories = await fetch_branch_histories(session, graphql_url, token, owner, repo, [branch], concurrency, store)
+  return histories[branch]
 
-async def fetch_github_data(session, graphql_url, token, owner, repo, dumptype, number=None, branch=None, sha=None):
+async def fetch_github_data(session, graphql_url, token, owner, repo, dumptype, number=None, branch=None, sha=None, concurrency=1, store=None):
   """
   Fetch discussion or pullRequest or issue or commits or commit data from GitHub GraphQL API
 
   Returns:
     QueryResult or CommitQueryResult object if successful
+    list of CommitQueryResult for commits
     None if data not found or error occurs
   """
-  headers = {
-    "Authorization": f"Bearer {token}",
-    "Content-Type": "application/json"
-  }
+  if dumptype == "commits":
+    return await fetch_commit_history(session, graphql_url, token, owner, repo, branch, concurrency, store)
+
 
   variables = {
     "owner": owner,
@@ -316,26 +2228,17 @@ async def fetch_github_data(session, graphql_url, token, owner, repo, dumptype,
   }
   if dumptype in ["discussion", "pullRequest", "issue"]:
     variables["number"] = number
-  elif dumptype == "commits":
-    variables["branch"] = branch
   elif dumptype == "commit":
     variables["sha"] = sha
 
   try:
     query = ""
-    if dumptype == "discussion":
-      query = queryDiscussion
-    elif dumptype == "pullRequest":
-      query = querypullRequests
-    elif dumptype == "issue":
-      query = queryIssues
-    elif dumptype == "commits":
-      query = queryCommits
+    if dumptype in itemQueries:
+      query = itemQueries[dumptype]["query"]
     elif dumptype == "commit":
       query = queryCommitBySHA
 
-    response = await session.post(graphql_url, headers=headers, json={"query": query, "variables": variables})
-    result = await response.json()
+    result = await post_graphql(session, graphql_url, token, query, variables)
 
     if result.get("errors", {}):
       if result["errors"][0].get("type", {}) != "NOT_FOUND":
@@ -347,110 +2250,15 @@ async def fetch_github_data(session, graphql_url, token, owner, repo, dumptype,
         return None
 
       queryResult = result["data"]["repository"][dumptype]
-      result_url = queryResult["url"]
-      result_state = queryResult["state"] if dumptype != "discussion" else ""
-      result_title = queryResult["title"]
-      result_body = queryResult["body"]
-      result_author = queryResult["author"]["login"] if queryResult["author"] else "None"
-      result_created_at = datetime.fromisoformat(queryResult["createdAt"].replace('Z', '+00:00'))
-
-      comments_data = []
-      if "comments" in queryResult: # discussions, issues, pullRequests have comments
-        has_next_page = True
-        comments_cursor = None
-        while has_next_page:
-          queryResult = result["data"]["repository"][dumptype]
-          comments = queryResult["comments"]["nodes"]
-
-          for comment in comments:
-            if not comment:
-              continue
-            comment_id = comment["id"]
-            comment_body = comment["body"]
-            comment_author = comment["author"]["login"] if comment["author"] else "None"
-            comment_created_at = datetime.fromisoformat(comment["createdAt"].replace('Z', '+00:00'))
-            replies = []
-
-            if dumptype == "discussion":
-              for reply in comment["replies"]["nodes"]:
-                reply_data = Reply(
-                  id=reply["id"],
-                  body=reply["body"],
-                  author=reply["author"]["login"] if reply["author"] else "None",
-                  created_at=datetime.fromisoformat(reply["createdAt"].replace('Z', '+00:00'))
-                )
-                replies.append(reply_data)
-
-            comments_data.append(Comment(
-              id=comment_id,
-              body=comment_body,
-              author=comment_author,
-              created_at=comment_created_at,
-              replies=replies
-            ))
-
-          has_next_page = queryResult["comments"]["pageInfo"]["hasNextPage"]
-          comments_cursor = queryResult["comments"]["pageInfo"]["endCursor"]
-          if has_next_page:
-            variables["commentsCursor"] = comments_cursor
-            response = await session.post(graphql_url, headers=headers, json={"query": query, "variables": variables})
-            result = await response.json()
-
-      return QueryResult(
-        url=result_url,
-        dumptype=dumptype,
-        number=number,
-        state=result_state,
-        title=result_title,
-        body=result_body,
-        author=result_author,
-        created_at=result_created_at,
-        comments=comments_data
-      )
-    elif dumptype == "commits":
-      commits_data = []
-      has_next_page = True
-      history_cursor = None
-      while has_next_page:
-        if result.get("data", {}).get("repository", {}).get("ref"):
-          history_data = result["data"]["repository"]["ref"]["target"]["history"]
-          history_edges = history_data["edges"]
-          for edge in history_edges:
-            node = edge["node"]
-            commit_data = CommitQueryResult(
-              dumptype=dumptype,
-              oid=node["oid"],
-              message=node["message"],
-              committedDate=datetime.fromisoformat(node["committedDate"].replace('Z', '+00:00')),
-              author=node["author"]["name"] if node["author"] else "None",
-            )
-            commits_data.append(commit_data)
-
-          has_next_page = history_data["pageInfo"]["hasNextPage"]
-          history_cursor = history_data["pageInfo"]["endCursor"]
-        else:
-          return None
-
-        if has_next_page:
-          variables["historyCursor"] = history_cursor
-          response = await session.post(graphql_url, headers=headers, json={"query": query, "variables": variables})
-          result = await response.json()
-          if result.get("errors"):
-            print("GraphQL Errors: " + str(result["errors"]))
-            return None
-
-      return commits_data # return list of CommitQueryResult
+      reply_pages = []
+      query_result = parse_query_result(queryResult, dumptype, number, reply_pages)
+      if not await fetch_remaining_comments(session, graphql_url, token, queryResult, query_result, reply_pages):
+        return None
+      return query_result
     elif dumptype == "commit":
       if result.get("data", {}).get("repository", {}).get("object"):
         commit_object = result["data"]["repository"]["object"]
-        commit_data = CommitQueryResult(
-          dumptype=dumptype,
-          oid=commit_object["oid"],
-          message=commit_object["message"],
-          committedDate=datetime.fromisoformat(commit_object["committedDate"].replace('Z', '+00:00')),
-          author=commit_object["author"]["name"] if commit_object["author"] else "None",
-        )
-        return commit_data # return single CommitQueryResult
+        return parse_commit(commit_object, dumptype) # return single CommitQueryResult
       else:
         return None
 
@@ -459,14 +2267,96 @@ async def fetch_github_data(session, graphql_url, token, owner, repo, dumptype,
     print(f"Error fetching {dumptype} {number if number is not None else branch or sha}: {e}")
     return None
 
-def output_markdown(queryResult: QueryResult, output_directory: pathlib.Path, number: int):
+class Shutdown:
+  """
+  Graceful shutdown of a run on SIGINT or SIGTERM
+
+  The first signal sets requested, so no new item is scheduled while the items in progress finish, and cancels
+  the task once grace_period seconds have passed. A second signal cancels the task at once.
+  """
+  SIGNALS = [signal.SIGINT, signal.SIGTERM]
+
+  def __init__(self, grace_period: float):
+    self.grace_period = grace_period
+    self.requested = False
+    self.task = None
+    self.handlers = {}
+
+  def install(self, task: asyncio.Future):
+    self.task = task
+    loop = asyncio.get_running_loop()
+    for signum in self.SIGNALS:
+      try:
+        loop.add_signal_handler(signum, self.request, signum)
+      except NotImplementedError:
+        # Windows event loops have no add_signal_handler, the handler then runs between two steps of the loop
+        self.handlers[signum] = signal.signal(signum, lambda signum, frame: loop.call_soon_threadsafe(self.request, signum))
+
+  def uninstall(self):
+    loop = asyncio.get_running_loop()
+    for signum in self.SIGNALS:
+      if signum in self.handlers:
+        signal.signal(signum, self.handlers.pop(signum))
+      else:
+        loop.remove_signal_handler(signum)
+
+  def request(self, signum: int):
+    if self.requested:
+      print(f"\nReceived {signal.Signals(signum).name} again, cancelling the requests in flight")
+      self.task.cancel()
+      return
+    self.requested = True
+    print(f"\nReceived {signal.Signals(signum).name}, finishing the items in progress within {self.grace_period:g} seconds")
+    asyncio.get_running_loop().call_later(self.grace_period, self.task.cancel)
+
+async def run_concurrently(items, handler, concurrency: int, shutdown: Shutdown = None):
+  """
+  Run handler(item) for every item using a bounded pool of worker tasks
+
+  Items are pulled lazily from a shared iterator, so at most `concurrency` handlers are awaiting at any time.
+  The handler is responsible for its own error handling, a failing item must not stop the other workers.
+  An error escaping a handler cancels the other workers before it is raised, so no item is still handled for a
+  caller that gave up. Once a shutdown is requested the workers finish their current item and stop pulling new ones.
+  """
+  iterator = iter(items)
+
+  async def worker():
+    for item in iterator:
+      if shutdown is not None and shutdown.requested:
+        return
+      await handler(item)
+
+  workers = [asyncio.ensure_future(worker()) for _ in range(max(1, concurrency))]
+  try:
+    await asyncio.gather(*workers)
+  except BaseException:
+    for task in workers:
+      task.cancel()
+    await asyncio.gather(*workers, return_exceptions=True)
+    raise
+
+def chunked(iterable, size: int):
   """
-  Convert discussion/issue/pr data to a single consolidated markdown file
+  Lazily split an iterable into lists of at most size items
+  """
+  iterator = iter(iterable)
+  while True:
+    chunk = list(itertools.islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
+
+def render_markdown(queryResult: QueryResult, output_directory: pathlib.Path, number: int) -> Tuple[pathlib.Path, str]:
+  """
+  Render discussion/issue/pr data as a single consolidated markdown document
 
   Args:
     queryResult (QueryResult): The query result data
     output_directory (pathlib.Path): Directory to save the markdown file
     number (int): The discussion or pullRequest number for naming
+
+  Returns:
+    The markdown file path and its content
   """
   def create_filename(dumptype: str, number: int, title: str) -> str:
     """
@@ -499,8 +2389,6 @@ def output_markdown(queryResult: QueryResult, output_directory: pathlib.Path, nu
     filename = base_filename + title_part
 
     return filename
-  # Create the output directory if it doesn't exist
-  output_directory.mkdir(parents=True, exist_ok=True)
 
   # Generate main filename
   base_filename = create_filename(queryResult.dumptype, number, queryResult.title)
@@ -511,14 +2399,18 @@ def output_markdown(queryResult: QueryResult, output_directory: pathlib.Path, nu
   # Prepare the markdown content
   markdown_content = []
 
-  # Add discussion title, author, and timestamp
-  markdown_content.append(f"# [{queryResult.title}]({queryResult.url})\n")
-  markdown_content.append(f"**@{queryResult.author}**   **Created at**: {queryResult.created_at.strftime('%Y-%m-%d %H:%M:%S %Z')}    {queryResult.state}\n\n")
-  markdown_content.append(f"{queryResult.body}\n")
-  markdown_content.append("---\n")
+  if queryResult.comments_offset is not None:
+    # Only the newer comments, appended after the last separator of the markdown file
+    markdown_content.append("")
+  else:
+    # Add discussion title, author, and timestamp
+    markdown_content.append(f"# [{queryResult.title}]({queryResult.url})\n")
+    markdown_content.append(f"**@{queryResult.author}**   **Created at**: {queryResult.created_at.strftime('%Y-%m-%d %H:%M:%S %Z')}    {queryResult.state}\n\n")
+    markdown_content.append(f"{queryResult.body}\n")
+    markdown_content.append("---\n")
 
   # Add comments and their replies
-  for i, comment in enumerate(queryResult.comments):
+  for i, comment in enumerate(queryResult.comments, queryResult.comments_offset or 0):
     # Add comment header, author, and timestamp
     markdown_content.append(f"## **Comment {i+1}**, **@{comment.author}**   **at**: {comment.created_at.strftime('%Y-%m-%d %H:%M:%S %Z')}\n\n")
     markdown_content.append(f"{comment.body}\n")
@@ -532,21 +2424,19 @@ def output_markdown(queryResult: QueryResult, output_directory: pathlib.Path, nu
     # Add separator between comments
     markdown_content.append("---\n")
 
-  # Write the consolidated markdown file
-  full_markdown_text = "\n".join(markdown_content)
-  markdown_path.write_text(full_markdown_text, encoding='utf-8')
+  return markdown_path, "\n".join(markdown_content)
 
-  print(f"Created file: {markdown_path}")
-
-def output_commit_markdown(commitQueryResult: CommitQueryResult, output_directory: pathlib.Path):
+def render_commit_markdown(commitQueryResult: CommitQueryResult, output_directory: pathlib.Path) -> Tuple[pathlib.Path, str]:
   """
-  Convert commit data to a markdown file named after commit SHA.
+  Render commit data as a markdown document named after commit SHA.
 
   Args:
     commitQueryResult (CommitQueryResult): The commit data
     output_directory (pathlib.Path): Directory to save the markdown file
+
+  Returns:
+    The markdown file path and its content
   """
-  output_directory.mkdir(parents=True, exist_ok=True)
   markdown_path = output_directory.joinpath(f"commit_{commitQueryResult.oid}.md")
 
   markdown_content = []
@@ -555,20 +2445,20 @@ def output_commit_markdown(commitQueryResult: CommitQueryResult, output_director
   markdown_content.append(f"{commitQueryResult.message}\n")
   markdown_content.append("---\n")
 
-  full_markdown_text = "\n".join(markdown_content)
-  markdown_path.write_text(full_markdown_text, encoding='utf-8')
-  print(f"Created file: {markdown_path}")
+  return markdown_path, "\n".join(markdown_content)
 
-def output_commits_to_single_markdown(commitsQueryResult: List[CommitQueryResult], output_directory: pathlib.Path, branch: str):
+def render_commits_markdown(commitsQueryResult: List[CommitQueryResult], output_directory: pathlib.Path, branch: str) -> Tuple[pathlib.Path, str]:
   """
-  Convert a list of commit data to a single markdown file containing all commits.
+  Render a list of commit data as a single markdown document containing all commits.
 
   Args:
     commitsQueryResult (List[CommitQueryResult]): List of commit data
     output_directory (pathlib.Path): Directory to save the markdown file
     branch (str): Branch name for filename
+
+  Returns:
+    The markdown file path and its content
   """
-  output_directory.mkdir(parents=True, exist_ok=True)
   markdown_path = output_directory.joinpath(f"commits_{branch}.md")
 
   markdown_content = []
@@ -586,9 +2476,166 @@ def output_commits_to_single_markdown(commitsQueryResult: List[CommitQueryResult
     markdown_content.append("---\n")
     commit_counter -= 1 # Decrement commit_counter
 
-  full_markdown_text = "\n".join(markdown_content)
-  markdown_path.write_text(full_markdown_text, encoding='utf-8')
-  print(f"Created file: {markdown_path}")
+  return markdown_path, "\n".join(markdown_content)
+
+def read_markdown(markdown_path: pathlib.Path) -> str:
+  """
+  Read a markdown file back into the text write_markdown was given, line endings of the bodies included
+  """
+  with markdown_path.open(encoding='utf-8', newline='') as markdown_file:
+    return markdown_file.read().replace(os.linesep, "\n")
+
+def write_markdown(markdown_path: pathlib.Path, full_markdown_text: str, append: bool = False) -> Tuple[str, bool]:
+  """
+  Write a rendered markdown document, creating the output directory if it doesn't exist
+
+  A file whose content is byte-identical is left untouched, so its mtime only changes when its content does.
+  Files are replaced atomically, a reader or an interrupted run never sees a partially written file.
+
+  Returns:
+    The content of the whole file (the existing content followed by the appended text when appending)
+    and whether the file was written
+  """
+  markdown_path.parent.mkdir(parents=True, exist_ok=True)
+  if append:
+    full_markdown_text = read_markdown(markdown_path) + full_markdown_text
+  # The bytes write_text would write, compared with the existing file when it has the same size
+  markdown_bytes = full_markdown_text.replace("\n", os.linesep).encode('utf-8')
+  if not append:
+    try:
+      if markdown_path.stat().st_size == len(markdown_bytes) and markdown_path.read_bytes() == markdown_bytes:
+        return full_markdown_text, False
+    except FileNotFoundError:
+      pass
+  # Written through a temporary file, an interrupted write leaves the previous file in place instead of half a file
+  temp_path = markdown_path.with_name(markdown_path.name + ".tmp")
+  temp_path.write_bytes(markdown_bytes)
+  temp_path.replace(markdown_path)
+  return full_markdown_text, True
+
+def report_write(markdown_path: pathlib.Path, written: bool, append: bool = False):
+  """
+  Print what write_markdown did, from the event loop so the lines of concurrent writers don't interleave
+  """
+  print(f"{'Appended to' if append else 'Created' if written else 'Unchanged'} file: {markdown_path}")
+
+class MarkdownPipeline:
+  """
+  Render and write stages fed by the fetch workers through bounded queues
+
+    fetch workers -> render queue -> render stage -> write queue -> writer stage (thread pool)
+
+  submit() blocks while the render queue is full, and the render stage blocks while the write queue is full,
+  so fetching slows down when the disk lags instead of buffering every result in memory.
+  written and unchanged count the files written and the files left untouched because their content didn't change.
+  """
+  def __init__(self, queue_size: int = 8, writers: int = 4):
+    self.render_queue = asyncio.Queue(maxsize=queue_size)
+    self.write_queue = asyncio.Queue(maxsize=queue_size)
+    self.writers = writers
+    self.executor = ThreadPoolExecutor(max_workers=writers, thread_name_prefix="markdown-writer")
+    self.path_locks = weakref.WeakValueDictionary() # a lock lives as long as a writer of its path holds it
+    self.tasks = []
+    self.written = 0
+    self.unchanged = 0
+
+  async def __aenter__(self):
+    self.tasks.append(asyncio.ensure_future(self._render()))
+    self.tasks.extend(asyncio.ensure_future(self._write()) for _ in range(self.writers))
+    return self
+
+  async def __aexit__(self, *exc_info):
+    # Drain both stages, the render stage forwards the shutdown to every writer
+    await self._put(self.render_queue, None, self.tasks[:1])
+    for task_result in await asyncio.gather(*self.tasks, return_exceptions=True):
+      if isinstance(task_result, Exception):
+        print("".join(traceback.format_exception(type(task_result), task_result, task_result.__traceback__)))
+    self.executor.shutdown(wait=True)
+
+  async def _put(self, queue: asyncio.Queue, job, consumers: list) -> bool:
+    """
+    Put job on queue unless every task draining it is gone, a dead stage must not block its producers forever
+
+    Returns:
+      True if the job was queued
+    """
+    put = asyncio.ensure_future(queue.put(job))
+    try:
+      while not put.done():
+        alive = [task for task in consumers if not task.done()]
+        if not alive:
+          put.cancel()
+          return False
+        await asyncio.wait([put, *alive], return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+      put.cancel()
+      raise
+    return True
+
+  def _notify(self, on_done, success: bool, markdown_path=None, full_markdown_text=None):
+    """
+    Call on_done, a callback that fails (e.g. recording the file in the manifest) reports the file as failed
+    """
+    if not on_done:
+      return
+    try:
+      on_done(success, markdown_path, full_markdown_text)
+    except Exception as e:
+      print(traceback.format_exc())
+      print(f"Error recording {markdown_path}: {e}")
+      if success:
+        self._notify(on_done, False)
+
+  async def submit(self, render, args: tuple, on_done=None, append: bool = False):
+    """
+    Queue a render function and its arguments, on_done(success, markdown_path, full_markdown_text) is called once
+    the file is written or failed, the path and text are None if rendering failed.
+    With append the rendered text is appended to the existing file and on_done gets the content of the whole file.
+    """
+    if not await self._put(self.render_queue, (render, args, on_done, append), self.tasks[:1]):
+      self._notify(on_done, False)
+
+  async def _render(self):
+    while True:
+      job = await self.render_queue.get()
+      if job is None:
+        for _ in range(self.writers):
+          await self._put(self.write_queue, None, self.tasks[1:])
+        return
+      render, args, on_done, append = job
+      try:
+        markdown_path, full_markdown_text = render(*args)
+      except Exception as e:
+        print(traceback.format_exc())
+        print(f"Error rendering markdown: {e}")
+        self._notify(on_done, False)
+        continue
+      if not await self._put(self.write_queue, (markdown_path, full_markdown_text, on_done, append), self.tasks[1:]):
+        self._notify(on_done, False)
+
+  async def _write(self):
+    loop = asyncio.get_running_loop()
+    while True:
+      job = await self.write_queue.get()
+      if job is None:
+        return
+      markdown_path, full_markdown_text, on_done, append = job
+      # Two writes of the same file, e.g. the same item requested twice, run one after the other
+      lock = self.path_locks.setdefault(markdown_path, asyncio.Lock())
+      try:
+        async with lock:
+          full_markdown_text, written = await loop.run_in_executor(self.executor, write_markdown, markdown_path, full_markdown_text, append)
+        report_write(markdown_path, written, append)
+        if written:
+          self.written += 1
+        else:
+          self.unchanged += 1
+        success = True
+      except Exception as e:
+        print(traceback.format_exc())
+        print(f"Error writing {markdown_path}: {e}")
+        success = False
+      self._notify(on_done, success, markdown_path, full_markdown_text)
 
 async def main():
   parser = argparse.ArgumentParser(description="Fetch and dump GitHub discussions or pullRequests or issues or commits data")
@@ -660,46 +2707,108 @@ async def main():
     return owner, repo, dumptype, number, branch, commit_sha
 
   def parse_range(value):
-    """Parse a single value or a range (e.g., '1000-1200')"""
+    """Parse a single value, a range (e.g., '1000-1200') or an open-ended range (e.g., '5000-') into a (start, end) interval"""
     try:
       if '-' in value:
-        start, end = map(int, value.split('-'))
-        if start > end:
+        start, end = value.split('-')
+        start, end = int(start), int(end) if end else None
+        if end is not None and start > end:
           raise argparse.ArgumentTypeError(f"Invalid range: {value}")
-        return list(range(start, end + 1))
+        return start, end
       else:
-        return [int(value)]
+        return int(value), int(value)
     except ValueError:
       raise argparse.ArgumentTypeError(f"Invalid input: {value}")
-    
-  parser.add_argument("-t", "--token", help="GitHub Access Token: If this parameter is not provided, the program will attempt to obtain a GitHub authentication token using the `gh auth login` command from the GitHub CLI (requires the `gh` CLI to be installed).")
+
+  parser.add_argument("-t", "--token", nargs='+', help="GitHub Access Token: If this parameter is not provided, the program will attempt to obtain a GitHub authentication token using the `gh auth login` command from the GitHub CLI (requires the `gh` CLI to be installed). Several space-separated tokens share the requests, each one is used while it has the most rate limit budget left")
+  parser.add_argument("--token-file", help="File with one GitHub Access Token per line, combined with `--token`")
   parser.add_argument("--url", help="GitHub Repository URL. Automatically extracts `owner`, `repo`, `dumptype`, and either `numbers` (for discussions, issues, or pull requests) or `branch` (for commits) or `sha` (for commit) based on the provided URL")
   parser.add_argument("--owner", help="GitHub Repository Owner, required unless `--url` is provided")
   parser.add_argument("--repo", help="GitHub Repository Name, required unless `--url` is provided")
+  parser.add_argument("--org", help="GitHub Organization, every repository of the organization is dumped in the same run")
+  parser.add_argument("--repo-list", help="File with one repository per line as `owner/repo`, a repository URL or a name of `--org` or `--owner`, all dumped in the same run")
   parser.add_argument("-dt", "--dumptype", help="Enter discussion or pullRequest or issue or commits or commit, default discussion", default="discussion")
-  parser.add_argument("-n", "--numbers", nargs='+', type=parse_range, help="GitHub Discussion or PullRequest or Issue Numbers (space-separated, supports ranges like '1000-1200')")
-  parser.add_argument("--branch", help="Git branch is required when `dumptype` is set to `commits` or provided through `--url`")
+  parser.add_argument("-n", "--numbers", nargs='+', type=parse_range, help="GitHub Discussion or PullRequest or Issue Numbers (space-separated, supports ranges like '1000-1200' and open-ended ranges like '5000-')")
+  parser.add_argument("--branch", nargs='+', help="Git branch is required when `dumptype` is set to `commits` or provided through `--url`. Several space-separated branches are fetched in parallel and share the commits of their common history")
   parser.add_argument("--sha", help="Git commit sha is required when `dumptype` is set to `commit` or provided through `--url`")
   parser.add_argument("-o", "--output-dir", help="Output directory for markdown files, default docs", default="docs")
   parser.add_argument("--api", help="GitHub GraphQL endpoint, default https://api.github.com/graphql", default="https://api.github.com/graphql")
+  parser.add_argument("--rate-limit-reserve", type=int, help="GraphQL rate limit points kept in reserve, all requests pause until the rate limit resets once the budget drops below it, default 50", default=50)
+  parser.add_argument("--max-retries", type=int, help="Number of times a failed request is retried with exponential backoff, default 5", default=5)
+  parser.add_argument("--retry-budget", type=int, help="Total number of retries allowed for the whole run, default 200", default=200)
+  parser.add_argument("--list", action="store_true", help="List the existing discussions or pullRequests or issues of the repository page by page instead of probing every number, all of them unless `--numbers` restricts the range. With `--numbers` only the item numbers are listed, from the oldest item, and the requested items are fetched `--page-size` at a time")
+  parser.add_argument("--page-size", type=int, help="Number of items per page in `--list` mode, default and at most 100 (40 for discussions)")
+  parser.add_argument("-b", "--batch-size", type=int, help="Number of discussions or pullRequests or issues requested per GraphQL query, default 10, at most 100 (40 for discussions)", default=10)
+  parser.add_argument("--full-refresh", action="store_true", help="Fetch everything again instead of only the commits added and the discussions or pullRequests or issues updated since the last run")
+  parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its checkpoint journal, skipping the items already written and continuing the commit histories from their last page")
+  parser.add_argument("--not-found-ttl", type=int, default=604800, help="Seconds a number found not to exist is skipped by later runs, 0 to probe every number again, default 604800 (a week)")
+  parser.add_argument("--grace-period", type=float, default=20, help="Seconds the items in progress are given to finish on SIGINT or SIGTERM before their requests are cancelled, default 20")
+  parser.add_argument("--max-connections", type=int, help="Maximum number of pooled HTTP connections, 0 for no limit, default 100", default=100)
+  parser.add_argument("--max-connections-per-host", type=int, help="Maximum number of pooled HTTP connections to the GraphQL host, 0 for no limit other than `--max-connections`, default 0", default=0)
+  parser.add_argument("--keepalive-timeout", type=float, help="Seconds an idle connection is kept open for reuse, default 60", default=60)
+  parser.add_argument("--dns-cache-ttl", type=int, help="Seconds resolved host addresses are cached, default 300", default=300)
+  parser.add_argument("--connect-timeout", type=float, help="Seconds allowed to open a connection before the request is retried, default 10", default=10)
+  parser.add_argument("--read-timeout", type=float, help="Seconds allowed between two reads of a response before the request is retried, default 60", default=60)
+  parser.add_argument("--stream-json", action="store_true", help="Decode responses incrementally while they are received, keeping memory low for very large pages at the cost of more CPU time (requires ijson)")
+  parser.add_argument("--cache", action="store_true", help="Reuse the GraphQL responses cached on disk by earlier runs and cache the new ones")
+  parser.add_argument("--no-cache", dest="cache", action="store_false", help="Do not use the response cache, default")
+  parser.add_argument("--refresh", action="store_true", help="Bypass and replace the cached responses, implies `--cache`. Items unchanged since the last run are still skipped, use `--full-refresh` to fetch everything again")
+  parser.add_argument("--cache-dir", default="~/.cache/github_dump_to_markdown", help="Directory of the response cache, default ~/.cache/github_dump_to_markdown")
+  parser.add_argument("--cache-ttl", type=int, help="Seconds a cached response is reused, default 3600 for discussions or pullRequests or issues, 600 for commits, no expiry for a single commit")
+  parser.add_argument("--cache-size", type=int, default=512, help="Maximum size of the response cache in MB, the least recently used responses are deleted beyond it, default 512")
+  parser.add_argument("-c", "--concurrency", type=int, help="Number of discussions or pullRequests or issues, or of commit history windows, fetched in parallel, default 4", default=4)
   args = parser.parse_args()
 
-  if not args.token:
+  tokens = list(args.token or [])
+  if args.token_file:
+    try:
+      lines = pathlib.Path(args.token_file).read_text(encoding='utf-8').splitlines()
+    except OSError as e:
+      print(f"\nError: Unable to read `--token-file` {args.token_file}: {e}\n")
+      sys.exit(1)
+    tokens.extend(line.strip() for line in lines if line.strip() and not line.strip().startswith("#"))
+
+  if not tokens:
     # Attempt to obtain a GitHub authentication token using the gh auth login command from the GitHub CLI
-    args.token = get_gh_token()
+    tokens.append(get_gh_token())
 
   if args.url:
-    args.owner, args.repo, dumptype, number, args.branch, args.sha = parse_github_url(args.url)
+    args.owner, args.repo, dumptype, number, branch, args.sha = parse_github_url(args.url)
+    if branch:
+      args.branch = [branch] + (args.branch or [])
     if dumptype:
       args.dumptype = dumptype
       if number:
         if not args.numbers:
           args.numbers = []
-        args.numbers.append([number])  # Append the extracted number as a list for consistency
+        args.numbers.append((number, number))  # Append the extracted number as an interval for consistency
 
 
-  if not args.owner or not args.repo:
-    print("\nError: `--owner` and `--repo` are required options, or you can specify `--url` to automatically retrieve the owner and repo.\n")
+  repositories = []
+  if args.owner and args.repo:
+    repositories.append((args.owner, args.repo))
+  if args.repo_list:
+    try:
+      lines = pathlib.Path(args.repo_list).read_text(encoding='utf-8').splitlines()
+    except OSError as e:
+      print(f"\nError: Unable to read `--repo-list` {args.repo_list}: {e}\n")
+      sys.exit(1)
+    for line in (line.strip() for line in lines):
+      if not line or line.startswith("#"):
+        continue
+      if "github.com" in line:
+        repositories.append(parse_github_url(line)[:2])
+      elif "/" in line:
+        repositories.append(tuple(line.split("/", 1)))
+      elif args.org or args.owner:
+        repositories.append((args.org or args.owner, line))
+      else:
+        print(f"\nError: `--repo-list` entry `{line}` has no owner, use `owner/repo` or provide `--owner` or `--org`.\n")
+        parser.print_help()
+        sys.exit(1)
+
+  if not repositories and not args.org:
+    print("\nError: `--owner` and `--repo` are required options, or you can specify `--url` to automatically retrieve the owner and repo, or `--org` or `--repo-list` to dump several repositories.\n")
     parser.print_help()
     sys.exit(1)
 
@@ -713,77 +2822,357 @@ async def main():
     parser.print_help()
     sys.exit(1)
 
-  # Convert discussion numbers to flatten list
-  numbers = []
-  if args.numbers:
-    numbers = [item for sublist in args.numbers for item in sublist]
-  # Convert output directory to Path object
-  output_dir = pathlib.Path(args.output_dir) / args.repo
+  if args.concurrency < 1:
+    print("\nError: `--concurrency` must be at least 1.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  # A larger query of discussions is rejected by GitHub for exceeding its node limit, failing every item of the query
+  max_per_query = LIST_PAGE_SIZE.get(args.dumptype, 100)
+  if args.page_size is not None and not 1 <= args.page_size <= max_per_query:
+    print(f"\nError: `--page-size` must be between 1 and {max_per_query} for {args.dumptype}.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  if not 1 <= args.batch_size <= max_per_query:
+    print(f"\nError: `--batch-size` must be between 1 and {max_per_query} for {args.dumptype}.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  if args.max_connections < 0 or args.max_connections_per_host < 0:
+    print("\nError: `--max-connections` and `--max-connections-per-host` must not be negative.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  if min(args.keepalive_timeout, args.dns_cache_ttl, args.connect_timeout, args.read_timeout) <= 0:
+    print("\nError: `--keepalive-timeout`, `--dns-cache-ttl`, `--connect-timeout` and `--read-timeout` must be positive.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  if args.not_found_ttl < 0:
+    print("\nError: `--not-found-ttl` must not be negative.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  if args.grace_period < 0:
+    print("\nError: `--grace-period` must not be negative.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  if args.cache_size < 1:
+    print("\nError: `--cache-size` must be at least 1.\n")
+    parser.print_help()
+    sys.exit(1)
+
+  if args.stream_json and ijson is None:
+    print("\nError: `--stream-json` requires the ijson package (pip install ijson).\n")
+    sys.exit(1)
+
+  token_pool = TokenPool(tokens, args.rate_limit_reserve)
+  retry_policy.max_retries = args.max_retries
+  retry_policy.budget = args.retry_budget
+  response_decoder.streaming = args.stream_json
+  if args.cache or args.refresh:
+    response_cache.open(
+      pathlib.Path(args.cache_dir).expanduser(),
+      args.cache_ttl if args.cache_ttl is not None else CACHE_TTLS.get(args.dumptype),
+      args.cache_size * 1024 * 1024,
+      args.refresh,
+    )
+
+  # Merge discussion numbers and ranges, numbers given more than once are only fetched once
+  requested_numbers = IntervalSet(args.numbers or [])
 
   args.dumptype = args.dumptype
 
-  async with aiohttp.ClientSession(trust_env=True) as session:
-    # Process each discussion number
-    fetch_processed = 0
-    fetch_failed = 0
-    if args.dumptype in ["discussion", "pullRequest", "issue"]:
-      for number in numbers:
-        try:
-          # Fetch discussion data
-          query_result = await fetch_github_data(
-            session,
-            args.api,
-            args.token,
-            args.owner,
-            args.repo,
-            args.dumptype,
-            number,
-          )
+  # Process each discussion number
+  fetch_processed = 0
+  fetch_failed = 0
+  fetch_unchanged = 0
+  fetch_known_not_found = 0
+  manifests = []
+  checkpoints = []
+  locks = []
+  # Set once the main task runs, SIGINT and SIGTERM stop the scheduling of new items
+  shutdown = Shutdown(args.grace_period)
+
+  def count_output(processed: int = 1, query_result: QueryResult = None, manifest: Manifest = None, checkpoint: Checkpoint = None):
+    """
+    Callback counting a markdown file once the writer stage has written it (or failed to),
+    a written discussion is recorded in the manifest and the checkpoint journal of its output directory
+    """
+    def on_done(success: bool, markdown_path=None, full_markdown_text=None):
+      nonlocal fetch_processed, fetch_failed
+      if success:
+        if manifest is not None:
+          try:
+            manifest.record(query_result, markdown_path, full_markdown_text)
+          except sqlite3.Error as e:
+            print(f"Error recording {markdown_path} in the manifest: {e}")
+            fetch_failed += 1
+            return
+        if checkpoint is not None:
+          checkpoint.item(query_result.dumptype, query_result.number)
+        fetch_processed += processed
+      else:
+        fetch_failed += 1
+    return on_done
 
-          # Output as markdown file if discussion exists
+  async def dump_repository(repository):
+    """
+    Dump one repository, an error setting up or dumping it is counted as one failure instead of ending the whole run
+    """
+    nonlocal fetch_failed
+    owner, repo = repository
+    try:
+      await dump_repository_items(repository)
+    except Exception as e:
+      print(traceback.format_exc())
+      print(f"Error dumping {owner}/{repo}: {e}")
+      fetch_failed += 1
+
+  async def dump_repository_items(repository):
+    """
+    Dump the requested discussions or pullRequests or issues or commits or commit of one repository
+    """
+    nonlocal fetch_failed, fetch_unchanged, fetch_known_not_found
+    owner, repo = repository
+    # Requests of this dump are scheduled round-robin with the other repositories
+    current_repository.set(repository)
+    numbers = requested_numbers
+    # Convert output directory to Path object, every repository has its own files, manifest, commit store and journal
+    output_dir = pathlib.Path(args.output_dir) / owner / repo if output_by_owner else pathlib.Path(args.output_dir) / repo
+    # Released once the pipeline has written every file
+    lock = OutputLock(output_dir)
+    if not lock.acquire():
+      print(f"Error: {output_dir} is used by another run, skipping {owner}/{repo}")
+      fetch_failed += 1
+      return
+    # Released with the manifests and journals at the end of the run, after the files queued by a failed dump are written
+    locks.append(lock)
+    manifest = None
+    checkpoint = None
+    if args.dumptype in ["discussion", "pullRequest", "issue"]:
+      # Closed once the pipeline has written every file
+      manifest = Manifest(output_dir)
+      manifests.append(manifest)
+    if args.dumptype != "commit":
+      checkpoint = Checkpoint(output_dir, args.resume)
+      checkpoints.append(checkpoint)
+      if checkpoint.items:
+        print(f"Resuming {owner}/{repo}: {len(checkpoint.items)} {args.dumptype} already written")
+
+    if args.dumptype in ["discussion", "pullRequest", "issue"] and args.list:
+      try:
+        # Stream the existing discussions page by page instead of probing every number
+        async for number, query_result in list_github_items(
+          session,
+          args.api,
+          token_pool,
+          owner,
+          repo,
+          args.dumptype,
+          numbers,
+          args.page_size,
+          args.concurrency,
+        ):
+          if shutdown.requested:
+            break
+          if (args.dumptype, number) in checkpoint.items:
+            continue
           if query_result:
-            output_markdown(query_result, output_dir, number)
-            fetch_processed += 1
+            await pipeline.submit(render_markdown, (query_result, output_dir, number), count_output(1, query_result, manifest, checkpoint))
           else:
             fetch_failed += 1
+      except Exception as e:
+        print(traceback.format_exc())
+        print(f"Error listing {args.dumptype}: {e}")
+        fetch_failed += 1
+    elif args.dumptype in ["discussion", "pullRequest", "issue"]:
+      if numbers.is_open:
+        # Close an open-ended range at the latest existing discussion
+        try:
+          latest_number = await fetch_latest_number(session, args.api, token_pool, owner, repo, args.dumptype)
+          numbers = numbers.bounded(latest_number) if latest_number else IntervalSet()
+          print(f"Latest {args.dumptype} is {latest_number}, fetching {numbers}")
         except Exception as e:
           print(traceback.format_exc())
-          print(f"Error processing {args.dumptype} {number:03}: {e}")
+          print(f"Error fetching the latest {args.dumptype} number: {e}")
+          numbers = IntervalSet()
           fetch_failed += 1
+
+      if checkpoint.items:
+        # Filtered lazily, a range of millions of numbers is never held in memory
+        numbers = (number for number in numbers if (args.dumptype, number) not in checkpoint.items)
+
+      # Numbers found not to exist by an earlier run are not probed again until --not-found-ttl expires
+      found = set()
+      not_found = set()
+      if not args.full_refresh and args.not_found_ttl:
+        known_not_found = manifest.not_found(args.dumptype, args.not_found_ttl)
+
+        def skip_known_not_found(numbers):
+          """
+          Filter the numbers lazily while counting the skipped ones, a large range is never held in memory
+          """
+          nonlocal fetch_known_not_found
+          for number in numbers:
+            if number in known_not_found:
+              fetch_known_not_found += 1
+            else:
+              yield number
+
+        if known_not_found:
+          numbers = skip_known_not_found(numbers)
+
+      if not args.full_refresh and manifest.has_items(args.dumptype):
+        # Cheap pre-pass on updatedAt, only the discussions updated since they were dumped are fetched again
+        changed = []
+        new = 0
+
+        async def check_updated(batch):
+          nonlocal fetch_failed, fetch_unchanged, new
+          try:
+            updated = await fetch_updated_at(session, args.api, token_pool, owner, repo, args.dumptype, batch)
+          except Exception as e:
+            print(traceback.format_exc())
+            print(f"Error checking {args.dumptype} {batch[0]}-{batch[-1]} for updates: {e}")
+            changed.extend(batch)
+            return
+          for number, updated_at in updated.items():
+            if updated_at is None:
+              not_found.add(number)
+              fetch_failed += 1
+              continue
+            found.add(number)
+            if manifest.is_unchanged(args.dumptype, number, updated_at):
+              fetch_unchanged += 1
+            else:
+              if not manifest.has_item(args.dumptype, number):
+                new += 1
+              changed.append(number)
+
+        await run_concurrently(chunked(numbers, UPDATED_PER_QUERY), check_updated, args.concurrency, shutdown)
+        numbers = sorted(changed)
+        print(f"{len(numbers) - new} {args.dumptype} updated since the last run, {new} new")
+
+        if args.dumptype != "discussion":
+          # New comments of an updated pullRequest or issue are fetched after its stored cursor and appended,
+          # discussions are fetched again in full since new replies land on older comments
+          threads = {}
+          for number in numbers:
+            thread = manifest.thread(args.dumptype, number)
+            if thread is not None:
+              threads[number] = thread
+          refetch = [number for number in numbers if number not in threads]
+
+          async def append_batch(batch):
+            nonlocal fetch_failed, fetch_unchanged
+            # The markdown files are read and hashed off the event loop, a file edited since it was written is fetched again
+            loop = asyncio.get_running_loop()
+            intact = await asyncio.gather(*(loop.run_in_executor(None, Manifest.is_intact, threads[number]) for number in batch))
+            refetch.extend(number for number, ok in zip(batch, intact) if not ok)
+            batch = [number for number, ok in zip(batch, intact) if ok]
+            if not batch:
+              return
+            try:
+              query_results = await fetch_appended_comments(session, args.api, token_pool, args.dumptype, {number: threads[number] for number in batch})
+            except Exception as e:
+              print(traceback.format_exc())
+              print(f"Error fetching new comments of {args.dumptype} {batch[0]}-{batch[-1]}: {e}")
+              refetch.extend(batch)
+              return
+            for number, query_result in query_results.items():
+              if query_result is None:
+                refetch.append(number)
+              elif query_result.comments:
+                await pipeline.submit(render_markdown, (query_result, output_dir, number), count_output(1, query_result, manifest, checkpoint), append=True)
+              else:
+                # Updated without a new comment or a change of what is rendered, e.g. labels or reactions
+                try:
+                  manifest.touch(query_result)
+                  fetch_unchanged += 1
+                except sqlite3.Error as e:
+                  print(f"Error recording {args.dumptype} {number} in the manifest: {e}")
+                  fetch_failed += 1
+
+          await run_concurrently(chunked(list(threads), APPEND_PER_QUERY), append_batch, args.concurrency, shutdown)
+          numbers = sorted(refetch)
+
+      async def process_batch(batch):
+        nonlocal fetch_failed
+        # Fetch the whole batch of discussions with one aliased query
+        query_results = await fetch_github_batch(
+          session,
+          args.api,
+          token_pool,
+          owner,
+          repo,
+          args.dumptype,
+          batch,
+          not_found,
+          args.concurrency,
+        )
+
+        for number, query_result in query_results.items():
+          # Output as markdown file if discussion exists
+          if query_result:
+            found.add(number)
+            await pipeline.submit(render_markdown, (query_result, output_dir, number), count_output(1, query_result, manifest, checkpoint))
+          else:
+            fetch_failed += 1
+
+      await run_concurrently(chunked(numbers, args.batch_size), process_batch, args.concurrency, shutdown)
+
+      # A missing number past the latest item may still be created, only the holes below an existing item are kept
+      try:
+        highest = max(found | {manifest.highest(args.dumptype)})
+        manifest.record_not_found(args.dumptype, [number for number in not_found if number < highest])
+      except sqlite3.Error as e:
+        print(f"Error recording the {args.dumptype} not found in the manifest: {e}")
     elif args.dumptype == "commits":
       try:
-        commits_query_result = await fetch_github_data(
+        # Commits dumped by earlier runs are kept in the output directory and shared by all the branches,
+        # only the commits not stored yet are fetched
+        commit_store = CommitStore.load(output_dir)
+        if args.full_refresh:
+          commit_store.commits.clear()
+        histories = await fetch_branch_histories(
           session,
           args.api,
-          args.token,
-          args.owner,
-          args.repo,
-          args.dumptype,
-          branch=args.branch,
+          token_pool,
+          owner,
+          repo,
+          args.branch,
+          args.concurrency,
+          commit_store,
+          checkpoint,
         )
-        if commits_query_result:
-          output_commits_to_single_markdown(commits_query_result, output_dir, args.branch) # call the new function to output all commits to a single file
-          fetch_processed = len(commits_query_result) # processed count is the number of commits
-        else:
-          fetch_failed += 1
+        if any(histories.values()):
+          commit_store.save()
+        for branch, commits_query_result in histories.items():
+          if commits_query_result:
+            # processed count is the number of commits, all of them are written to a single file per branch
+            await pipeline.submit(render_commits_markdown, (commits_query_result, output_dir, branch), count_output(len(commits_query_result)))
+          else:
+            fetch_failed += 1
       except Exception as e:
         print(traceback.format_exc())
-        print(f"Error processing {args.dumptype} on branch {args.branch}: {e}")
+        print(f"Error processing {args.dumptype} on branch {' '.join(args.branch)}: {e}")
         fetch_failed += 1
     elif args.dumptype == "commit":
       try:
         commit_query_result = await fetch_github_data(
           session,
           args.api,
-          args.token,
-          args.owner,
-          args.repo,
+          token_pool,
+          owner,
+          repo,
           args.dumptype,
           sha=args.sha,
         )
         if commit_query_result: # commit_query_result is a single CommitQueryResult
-          output_commit_markdown(commit_query_result, output_dir)
-          fetch_processed += 1
+          await pipeline.submit(render_commit_markdown, (commit_query_result, output_dir), count_output())
         else:
           fetch_failed += 1
       except Exception as e:
@@ -791,10 +3180,85 @@ async def main():
         print(f"Error processing {args.dumptype} with sha {args.sha}: {e}")
         fetch_failed += 1
 
-    # Print summary
-    print(f"\nProcessing complete.")
-    print(f"{args.dumptype} processed successfully: {fetch_processed}")
-    print(f"{args.dumptype} failed: {fetch_failed}")
+  # One pool of keep-alive connections for all the requests, a timed out connect or read is retried by post_graphql
+  connector = aiohttp.TCPConnector(
+    limit=args.max_connections,
+    limit_per_host=args.max_connections_per_host,
+    keepalive_timeout=args.keepalive_timeout,
+    ttl_dns_cache=args.dns_cache_ttl,
+  )
+  timeout = aiohttp.ClientTimeout(total=None, connect=args.connect_timeout, sock_read=args.read_timeout)
+
+  async with aiohttp.ClientSession(connector=connector, timeout=timeout, trust_env=True) as session, MarkdownPipeline(queue_size=args.concurrency * 2) as pipeline:
+    if args.org:
+      try:
+        repositories.extend((args.org, name) for name in await fetch_organization_repositories(session, args.api, token_pool, args.org))
+      except Exception as e:
+        print(traceback.format_exc())
+        print(f"Error listing the repositories of {args.org}: {e}")
+        fetch_failed += 1
+
+    # Repositories given more than once are only dumped once, GitHub names are case insensitive
+    unique_repositories = {}
+    for owner, repo in repositories:
+      unique_repositories.setdefault((owner.lower(), repo.lower()), (owner, repo))
+    repositories = list(unique_repositories.values())
+    # Repositories of different owners may share a name
+    output_by_owner = len({owner.lower() for owner, _ in repositories}) > 1
+    # Item completions and reply pages multiply the requests of every item in flight, one global bound keeps them
+    # under GitHub's limit on concurrent requests
+    request_scheduler.slots = MAX_REQUESTS_IN_FLIGHT
+    if len(repositories) > 1:
+      # All the repositories share `--concurrency` request slots, a few more repositories than slots are in progress
+      # so that every slot is kept busy while a repository starts or finishes
+      request_scheduler.slots = min(args.concurrency, MAX_REQUESTS_IN_FLIGHT)
+      print(f"Dumping {len(repositories)} repositories")
+    dump = asyncio.ensure_future(run_concurrently(repositories, dump_repository, args.concurrency * 2, shutdown))
+    shutdown.install(dump)
+    try:
+      await dump
+    except asyncio.CancelledError:
+      if not shutdown.requested or not dump.cancelled():
+        raise
+      # Calls shared by the cancelled items have no caller left
+      request_flights.cancel()
+      print("Cancelled the requests still in flight")
+    finally:
+      shutdown.uninstall()
+    # Leaving the pipeline writes the markdown files already rendered or queued
+
+  for manifest in manifests:
+    try:
+      manifest.close()
+    except sqlite3.Error as e:
+      print(f"Error closing the manifest: {e}")
+  # A completed run is continued from the manifests and commit stores, an interrupted one keeps its journals for --resume
+  for checkpoint in checkpoints:
+    try:
+      checkpoint.close(completed=not shutdown.requested)
+    except OSError as e:
+      print(f"Error closing {checkpoint.path}: {e}")
+  for lock in locks:
+    lock.release()
+
+  # Print summary
+  print(f"\nProcessing complete.")
+  print(f"{args.dumptype} processed successfully: {fetch_processed}")
+  if fetch_unchanged:
+    print(f"{args.dumptype} unchanged since the last run: {fetch_unchanged}")
+  if fetch_known_not_found:
+    print(f"{args.dumptype} skipped, not found by an earlier run: {fetch_known_not_found}")
+  print(f"{args.dumptype} failed: {fetch_failed}")
+  print(f"markdown files written: {pipeline.written}, unchanged: {pipeline.unchanged}")
+  if shutdown.requested:
+    print("Interrupted, run again with the same options and --resume to continue")
 
 if __name__ == "__main__":
-  asyncio.run(main())
\ No newline at end of file
+  if uvloop is not None and hasattr(uvloop, "run"):
+    uvloop.run(main())
+  elif uvloop is not None:
+    # uvloop.run() was added in uvloop 0.18, older versions only provide the event loop policy
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    asyncio.run(main())
+  else:
+    asyncio.run(main())
\ No newline at end of file